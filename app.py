@@ -1,10 +1,20 @@
 import os
-from flask import Flask, render_template, request, jsonify, Response
+import json
+import threading
+import click
+from flask import Flask, render_template, request, jsonify, Response, send_file
+from flask.cli import AppGroup
 from config import Config
 from models import db, Activity
-from calendar_utils import get_busy_times, create_ical_feed
-from scheduler import generate_schedule
+from calendar_utils import fetch_all_busy_times, create_ical_feed, configure_http_session, configure_busy_times_cache, busy_times_digest, atomic_write
+from scheduler import generate_schedule, schedule_digest, coalesce_events
+from schedule_cache import ScheduleCache, events_to_json, events_from_json
+from single_flight import SingleFlight
+from tracing import tracing, current_trace, TimedChunks
+from refresher import BusyTimesRefresher
+from intervals import IntervalSet
 from datetime import datetime, timedelta, time
+from contextlib import nullcontext
 import pytz # Pour la gestion des fuseaux horaires
 
 # Crée le dossier 'instance' s'il n'existe pas (pour SQLite)
@@ -18,6 +28,63 @@ app.config.from_object(Config)
 # Initialise SQLAlchemy avec l'application Flask
 db.init_app(app)
 
+# Configure la session HTTP partagée pour le téléchargement des calendriers sources
+configure_http_session(
+    pool_connections=app.config.get('HTTP_POOL_CONNECTIONS', 10),
+    pool_maxsize=app.config.get('HTTP_POOL_MAXSIZE', 10),
+    max_retries=app.config.get('HTTP_MAX_RETRIES', 0)
+)
+
+# Cache des périodes occupées parsées (évite de reparser un contenu source inchangé)
+configure_busy_times_cache(
+    max_entries=app.config.get('PARSE_CACHE_SIZE', 64),
+    cache_dir=app.config.get('PARSE_CACHE_DIR') or None,
+    max_disk_entries=app.config.get('PARSE_CACHE_DISK_ENTRIES', 256)
+)
+
+# Instantanés des périodes occupées, rafraîchis en arrière-plan (stale-while-revalidate)
+busy_times_refresher = BusyTimesRefresher(
+    max_age=app.config.get('CALENDAR_REFRESH_INTERVAL', 300),
+    refresh_intervals=app.config.get('CALENDAR_REFRESH_INTERVALS'),
+    cache_dir=app.config.get('CALENDAR_CACHE_DIR') or None,
+    max_workers=app.config.get('CALENDAR_FETCH_MAX_WORKERS', 4),
+    parser=app.config.get('CALENDAR_PARSER', 'stream')
+)
+if app.config.get('BACKGROUND_REFRESH_ENABLED'):
+    busy_times_refresher.start()
+
+# Dernier planning généré, réparé de façon incrémentale au prochain appel (SCHEDULER_INCREMENTAL)
+schedule_state = {}
+schedule_state_lock = threading.Lock()
+
+# Plannings déjà générés, indexés par l'empreinte de leurs entrées
+schedule_cache = ScheduleCache(
+    max_entries=app.config.get('SCHEDULE_CACHE_SIZE', 64),
+    persistent=app.config.get('SCHEDULE_CACHE_PERSISTENT', False),
+    max_persistent_entries=app.config.get('SCHEDULE_CACHE_DB_MAX_ENTRIES', 256)
+) if app.config.get('SCHEDULE_CACHE_SIZE', 64) > 0 else None
+
+
+def _dump_feed_schedule(result):
+    """Sérialise (ETag, événements planifiés) pour les autres processus workers."""
+    etag, scheduled_events = result
+    return json.dumps([etag, events_to_json(scheduled_events)]).encode('utf-8')
+
+
+def _load_feed_schedule(data):
+    """Reconstruit le résultat sérialisé par _dump_feed_schedule."""
+    etag, events = json.loads(data)
+    return etag, events_from_json(events)
+
+
+# Générations simultanées du flux regroupées : une seule récupération des sources et
+# planification par jeu d'entrées, partagée entre threads et entre processus (verrou de fichier)
+feed_flight = SingleFlight(
+    lock_dir=app.config.get('FEED_SINGLE_FLIGHT_DIR') or None,
+    dumps=_dump_feed_schedule,
+    loads=_load_feed_schedule
+) if app.config.get('FEED_SINGLE_FLIGHT', True) else None
+
 # Crée les tables de la base de données si elles n'existent pas
 with app.app_context():
     db.create_all()
@@ -97,9 +164,108 @@ def delete_activity(id):
 
 # --- Route pour le flux iCalendar ---
 
+def _with_feed_validators(response, etag):
+    """
+    Ajoute l'ETag et l'en-tête Cache-Control configuré à une réponse du flux. L'ETag est
+    faible : deux réponses de même ETag ont le même planning, mais pas forcément les mêmes
+    octets (DTSTAMP est l'heure de génération).
+    """
+    response.set_etag(etag, weak=True)
+    cache_control = app.config.get('FEED_CACHE_CONTROL')
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def _static_feed_path():
+    """Chemin du flux pré-généré (FEED_STATIC_PATH, instance/feed.ics par défaut)."""
+    return app.config.get('FEED_STATIC_PATH') or os.path.join(app.instance_path, 'feed.ics')
+
+
+def _with_trace(response, trace):
+    """
+    Ajoute l'en-tête Server-Timing de la trace à la réponse et écrit son enregistrement de log
+    (en streaming, l'enregistrement est écrit à la fin de l'envoi, voir _traced_stream).
+    """
+    if not trace.enabled:
+        return response
+    if not response.is_streamed:
+        trace.count('bytes_sent', response.content_length or 0)
+    response.headers['Server-Timing'] = trace.server_timing()
+    if not response.is_streamed:
+        trace.log()
+    return response
+
+
+def _traced_stream(chunks, trace):
+    """Transmet les morceaux du flux en comptant leur sérialisation, puis écrit le log de la trace."""
+    timed_chunks = TimedChunks(chunks)
+    try:
+        yield from timed_chunks
+    finally:
+        trace.add_duration('serialize', timed_chunks.elapsed)
+        trace.count('bytes_sent', timed_chunks.size)
+        trace.log()
+
+
 @app.route('/calendar/feed.ics')
 def generate_ical_feed():
-    """Génère et renvoie le planning sous forme de flux iCalendar."""
+    """
+    Renvoie le planning sous forme de flux iCalendar (pré-généré ou généré à la demande).
+    Paramètre optionnel ?weeks=N : nombre de semaines consécutives planifiées (FEED_WEEKS par défaut).
+    """
+    default_weeks = app.config.get('FEED_WEEKS', 1)
+    weeks = min(max(request.args.get('weeks', default_weeks, type=int), 1), app.config.get('FEED_MAX_WEEKS', 52))
+    if app.config.get('FEED_STATIC_ENABLED') and weeks == default_weeks:
+        # Fichier écrit par 'flask nexday build-feed' ou le thread de génération : aucun accès réseau,
+        # parsing ou planification dans la requête (ETag / 304 et envoi du fichier gérés par send_file)
+        static_path = _static_feed_path()
+        if os.path.exists(static_path):
+            response = send_file(static_path, mimetype='text/calendar', as_attachment=True,
+                                 download_name='planning_genere.ics', conditional=True, etag=True)
+            cache_control = app.config.get('FEED_CACHE_CONTROL')
+            if cache_control:
+                response.headers['Cache-Control'] = cache_control
+            return response
+        print(f"Avertissement: Flux pré-généré absent ({static_path}), génération à la demande.")
+
+    # En mode streaming, ical_content est un générateur : le corps part sans Content-Length
+    # (transfert chunked), un VEVENT à la fois, sans construire tout le flux en mémoire
+    with tracing('feed', enabled=app.config.get('FEED_TRACING', False)) as trace:
+        ical_content, etag, filename = build_feed(
+            is_fresh=lambda etag: request.if_none_match.contains_weak(etag),
+            stream=app.config.get('FEED_STREAMING', False),
+            weeks=weeks
+        )
+    if ical_content is None:
+        print("Flux inchangé depuis la dernière requête du client (304).")
+        return _with_trace(_with_feed_validators(Response(status=304), etag), trace)
+    if trace.enabled and not isinstance(ical_content, bytes):
+        ical_content = _traced_stream(ical_content, trace)
+    return _with_trace(_with_feed_validators(Response(
+        ical_content,
+        mimetype='text/calendar',
+        headers={'Content-Disposition': f'attachment; filename={filename}'} # Suggère un nom de fichier
+    ), etag), trace)
+
+
+def build_feed(is_fresh=None, stream=False, weeks=None):
+    """
+    Pipeline complet du flux : activités, périodes occupées des calendriers sources,
+    planification et sérialisation iCalendar.
+
+    Args:
+        is_fresh (callable): Appelée avec le validateur (ETag) dès qu'il est connu ; si elle
+                             retourne True (le client a déjà cette version), le pipeline s'arrête.
+        stream (bool): Retourner le contenu sous forme de générateur de morceaux (bytes).
+        weeks (int): Nombre de semaines consécutives à planifier (FEED_WEEKS par défaut).
+
+    Returns:
+        tuple: (contenu iCalendar en bytes ou générateur de morceaux, ou None si is_fresh
+                a arrêté le pipeline, ETag, nom de fichier suggéré).
+    """
+
+    trace = current_trace() # Trace de la requête (sans effet si le traçage est désactivé)
 
     # --- Ajout pour débogage ---
     print(f"Debug [app.py route]: Value in app.config['PERSONAL_CALENDAR_URLS'] = {app.config.get('PERSONAL_CALENDAR_URLS')}")
@@ -114,23 +280,52 @@ def generate_ical_feed():
         local_tz = pytz.utc
         local_tz_name = 'UTC' # Update name if fallback occurs
 
-    # 1. Définir la période pour laquelle générer le planning (ex: semaine prochaine)
+    # 1. Définir la période pour laquelle générer le planning (semaine prochaine, et les suivantes si weeks > 1)
+    weeks = weeks or app.config.get('FEED_WEEKS', 1)
     now_local = datetime.now(local_tz)
     days_until_monday = (7 - now_local.weekday()) % 7
     next_monday_local = now_local.date() + timedelta(days=days_until_monday)
     if days_until_monday == 0: next_monday_local += timedelta(days=7)
     start_date_local = next_monday_local
     end_date_local = start_date_local + timedelta(days=6) # Du lundi au dimanche inclus
+    # Fin de la dernière semaine : les sources sont récupérées et parsées une seule fois pour toute la période
+    horizon_end_date_local = start_date_local + timedelta(weeks=weeks, days=-1)
 
-    print(f"Génération du planning pour la semaine du {start_date_local} au {end_date_local} ({local_tz_name})")
+    start_dt_local_tz = local_tz.localize(datetime.combine(start_date_local, time.min))
+    end_dt_local_tz = local_tz.localize(datetime.combine(end_date_local, time.max))
+    week_start_utc = start_dt_local_tz.astimezone(pytz.utc)
+    week_end_utc = end_dt_local_tz.astimezone(pytz.utc)
+
+    print(f"Génération du planning pour la semaine du {start_date_local} au {end_date_local} ({local_tz_name})"
+          + (f", sur {weeks} semaines (jusqu'au {horizon_end_date_local})" if weeks > 1 else ""))
+
+    incremental = app.config.get('SCHEDULER_INCREMENTAL', False)
+    coalesce = app.config.get('FEED_COALESCE_EVENTS', False)
+    schedule_options = {
+        'engine': app.config.get('SCHEDULER_ENGINE', 'greedy'),
+        'improve_budget_ms': app.config.get('SCHEDULER_IMPROVE_BUDGET_MS', 0),
+        'improve_seed': app.config.get('SCHEDULER_IMPROVE_SEED', 0),
+        'weeks': weeks,
+        'contiguous_blocks': app.config.get('SCHEDULER_CONTIGUOUS_BLOCKS', False),
+    }
+
+    def feed_etag(source_digests):
+        """Validateur HTTP du flux : empreinte des activités, de la semaine, des options et des sources."""
+        return schedule_digest(
+            activities, (), week_start_utc, week_end_utc, local_tz_name=local_tz_name,
+            sources=tuple(source_digests), incremental=incremental, coalesce=coalesce, **schedule_options
+        )
 
 
     # 2. Récupérer les activités depuis la base de données
     activities = Activity.query.all()
     if not activities:
         # Retourner un calendrier vide mais valide
-        empty_cal = create_ical_feed([], target_tz=local_tz_name)
-        return Response(empty_cal, mimetype='text/calendar', headers={'Content-Disposition': 'attachment; filename=planning_vide.ics'})
+        etag = feed_etag(())
+        if is_fresh is not None and is_fresh(etag):
+            return None, etag, 'planning_vide.ics'
+        empty_cal = create_ical_feed([], target_tz=local_tz_name, stream=stream)
+        return empty_cal, etag, 'planning_vide.ics'
 
 
     # 3. Récupérer les URLs des calendriers sources depuis la configuration
@@ -138,78 +333,208 @@ def generate_ical_feed():
     if not calendar_urls:
          print("Avertissement: Pas d'URLs de calendrier source configurées. Planning basé uniquement sur semaine vide.")
 
+    # 3.1 Requête conditionnelle : si toutes les sources ont un instantané en mémoire, le validateur
+    #     se calcule sans téléchargement, parsing ni planification
+    etag = None
+    if app.config.get('BACKGROUND_REFRESH_ENABLED'):
+        source_digests = busy_times_refresher.peek_digests(calendar_urls, start_date_local, horizon_end_date_local, target_tz=local_tz_name)
+        if source_digests is not None:
+            etag = feed_etag(source_digests)
+            if is_fresh is not None and is_fresh(etag):
+                return None, etag, 'planning_genere.ics'
 
-    # 4. Obtenir les périodes occupées depuis TOUS les calendriers sources
-    all_busy_times_utc = []
-    start_dt_local_tz = local_tz.localize(datetime.combine(start_date_local, time.min))
-    end_dt_local_tz = local_tz.localize(datetime.combine(end_date_local, time.max))
-    week_start_utc = start_dt_local_tz.astimezone(pytz.utc)
-    week_end_utc = end_dt_local_tz.astimezone(pytz.utc)
 
-    print("-" * 20)
-    print("Récupération des périodes occupées depuis les calendriers:")
-    for idx, calendar_url in enumerate(calendar_urls):
-        print(f"  - Calendrier {idx+1}: {calendar_url[:50]}...") # Affiche le début de l'URL
-        busy_times_single = get_busy_times(calendar_url, start_date_local, end_date_local, target_tz=local_tz_name)
-        if busy_times_single:
-            print(f"    > {len(busy_times_single)} période(s) trouvée(s).")
-            all_busy_times_utc.extend(busy_times_single)
-        else:
-            print("    > Aucune période trouvée pour ce calendrier dans la plage horaire.")
-    print("-" * 20)
-
-    # 4.1 Fusionner et trier TOUTES les périodes occupées récupérées
-    #     Même si get_busy_times fusionne déjà en interne, il faut refusionner
-    #     les résultats combinés des différents calendriers.
-    if all_busy_times_utc:
-        all_busy_times_utc.sort() # Trier par heure de début
-        merged_busy_times_utc = []
-        if all_busy_times_utc: # Vérifier si la liste n'est pas vide après l'extend
-            current_start, current_end = all_busy_times_utc[0]
-            for next_start, next_end in all_busy_times_utc[1:]:
-                if next_start <= current_end: # Chevauchement ou adjacence
-                    current_end = max(current_end, next_end)
-                else:
-                    merged_busy_times_utc.append((current_start, current_end))
-                    current_start, current_end = next_start, next_end
-            merged_busy_times_utc.append((current_start, current_end))
-        busy_times_utc = merged_busy_times_utc # Utiliser la liste fusionnée finale
-        print("Périodes occupées totales fusionnées:")
-        for start, end in busy_times_utc:
-             print(f"  - De {start.strftime('%Y-%m-%d %H:%M:%S %Z')} à {end.strftime('%Y-%m-%d %H:%M:%S %Z')}")
-        print("-" * 20)
+    def compute_schedule():
+        """Étapes 4 et 5 (récupération des sources, fusion, planification) : (ETag, événements)."""
+        # 4. Obtenir les périodes occupées depuis TOUS les calendriers sources
+        busy_times_by_source = [] # Une liste triée et fusionnée par calendrier
 
-    else:
-        busy_times_utc = [] # Assurer que c'est une liste vide si aucun calendrier n'a renvoyé de période
-        print("Aucune période occupée trouvée dans aucun calendrier.")
         print("-" * 20)
+        print("Récupération des périodes occupées depuis les calendriers:")
+        with trace.phase('fetch'): # Durée murale (download et parse : durées cumulées par source)
+            if app.config.get('BACKGROUND_REFRESH_ENABLED'):
+                # Servir le dernier instantané valide, rafraîchi en arrière-plan s'il est périmé
+                fetch_results = busy_times_refresher.get_busy_times(
+                    calendar_urls,
+                    start_date_local,
+                    horizon_end_date_local,
+                    target_tz=local_tz_name,
+                    deadline=app.config.get('CALENDAR_FETCH_DEADLINE')
+                )
+            else:
+                fetch_results = fetch_all_busy_times(
+                    calendar_urls,
+                    start_date_local,
+                    horizon_end_date_local,
+                    target_tz=local_tz_name,
+                    max_workers=app.config.get('CALENDAR_FETCH_MAX_WORKERS', 4),
+                    deadline=app.config.get('CALENDAR_FETCH_DEADLINE'),
+                    cache_dir=app.config.get('CALENDAR_CACHE_DIR') or None,
+                    parser=app.config.get('CALENDAR_PARSER', 'stream')
+                )
+        # Les résultats sont dans l'ordre de la configuration, quel que soit l'ordre d'arrivée
+        for idx, result in enumerate(fetch_results):
+            print(f"  - Calendrier {idx+1}: {result['url'][:50]}... ({result['duration']*1000:.0f} ms, {result['status']})") # Affiche le début de l'URL
+            busy_times_single = result['busy_times']
+            if busy_times_single:
+                print(f"    > {len(busy_times_single)} période(s) trouvée(s).")
+                busy_times_by_source.append(busy_times_single)
+            elif result['status'] == 'timeout':
+                print("    > Échéance dépassée, calendrier ignoré pour cette génération.")
+            elif result['status'] == 'error':
+                print("    > Calendrier indisponible et aucun instantané précédent.")
+            else:
+                print("    > Aucune période trouvée pour ce calendrier dans la plage horaire.")
+        print("-" * 20)
+
+        # Validateur calculé d'après les périodes occupées effectivement utilisées
+        fetched_etag = feed_etag([busy_times_digest(result['busy_times']) for result in fetch_results])
+
+        # 4.1 Fusionner TOUTES les périodes occupées récupérées
+        #     Même si get_busy_times fusionne déjà en interne, il faut refusionner
+        #     les résultats combinés des différents calendriers (fusion k-voies des listes déjà triées).
+        with trace.phase('merge'):
+            busy_times_utc = IntervalSet.from_sorted_sources(*busy_times_by_source)
+        trace.count('busy_intervals', len(busy_times_utc))
+        if busy_times_utc:
+            print("Périodes occupées totales fusionnées:")
+            for start, end in busy_times_utc.to_datetimes():
+                 print(f"  - De {start.strftime('%Y-%m-%d %H:%M:%S %Z')} à {end.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+            print("-" * 20)
 
+        else:
+            print("Aucune période occupée trouvée dans aucun calendrier.")
+            print("-" * 20)
+
+
+        # 5. Générer le planning avec le scheduler
+        #    Utilisation des datetime UTC pour la logique interne du scheduler
+        #    Passer le fuseau horaire local pour les contraintes internes au scheduler
+        # Entrées identiques (cas des clients qui interrogent le flux toutes les quelques minutes) :
+        # réutiliser le planning déjà généré, sans aucun calcul de planification. Pas en mode
+        # incrémental : un planning relu du cache ne met pas à jour schedule_state, et la
+        # réparation suivante partirait d'un autre planning que celui servi aux clients.
+        cache = schedule_cache if not incremental else None
+        schedule_key = schedule_digest(
+            activities, busy_times_utc, week_start_utc, week_end_utc,
+            local_tz_name=local_tz_name, incremental=incremental, **schedule_options
+        )
+        with trace.phase('schedule'):
+            scheduled_events = cache.get(schedule_key) if cache is not None else None
+            if scheduled_events is not None:
+                print(f"Planning trouvé dans le cache ({len(scheduled_events)} créneaux, empreinte {schedule_key[:12]}).")
+            else:
+                print(f"Appel de generate_schedule avec local_tz_name='{local_tz_name}'") # Debug
+                with schedule_state_lock if incremental else nullcontext():
+                    scheduled_events = generate_schedule(
+                        activities,
+                        busy_times_utc,
+                        week_start_utc,
+                        week_end_utc,
+                        local_tz_name=local_tz_name, # <-- Passer le nom du fuseau horaire ici
+                        # slot_duration_minutes peut être ajouté ici si on veut le rendre configurable via app.py
+                        vectorized=app.config.get('SCHEDULER_VECTORIZED', False),
+                        state=schedule_state if incremental else None, # Planning précédent, réparé plutôt que recalculé
+                        **schedule_options
+                    )
+                if cache is not None:
+                    cache.set(schedule_key, scheduled_events)
+        return fetched_etag, scheduled_events
+
+    # Requêtes simultanées aux mêmes entrées (activités, semaine, sources, options) :
+    # une seule exécute les étapes 4 et 5, les autres attendent et partagent son résultat
+    if feed_flight is not None:
+        flight_key = schedule_digest(
+            activities, (), week_start_utc, week_end_utc, local_tz_name=local_tz_name,
+            urls=tuple(calendar_urls), incremental=incremental, **schedule_options
+        )
+        (fetched_etag, scheduled_events), shared = feed_flight.do(flight_key, compute_schedule)
+        if shared:
+            trace.count('shared_result')
+            print(f"Planning partagé par une génération simultanée ({len(scheduled_events)} créneaux).")
+    else:
+        fetched_etag, scheduled_events = compute_schedule()
 
-    # 5. Générer le planning avec le scheduler
-    #    Utilisation des datetime UTC pour la logique interne du scheduler
-    #    Passer le fuseau horaire local pour les contraintes internes au scheduler
-    print(f"Appel de generate_schedule avec local_tz_name='{local_tz_name}'") # Debug
-    scheduled_events = generate_schedule(
-        activities,
-        busy_times_utc,
-        week_start_utc,
-        week_end_utc,
-        local_tz_name=local_tz_name # <-- Passer le nom du fuseau horaire ici
-        # slot_duration_minutes peut être ajouté ici si on veut le rendre configurable via app.py
-    )
+    # Validateur des instantanés qui ont produit le planning : calculé après téléchargement, ou
+    # différent de celui de 3.1 si une source a été rafraîchie entre-temps
+    if fetched_etag != etag:
+        etag = fetched_etag
+        if is_fresh is not None and is_fresh(etag):
+            return None, etag, 'planning_genere.ics'
 
+    # 5.1 Un événement par bloc d'activité plutôt qu'un par créneau (flux jusqu'à 4x plus petit)
+    if coalesce:
+        slot_count = len(scheduled_events)
+        scheduled_events = coalesce_events(scheduled_events)
+        print(f"{slot_count} créneaux fusionnés en {len(scheduled_events)} événements.")
 
     # 6. Créer le contenu du fichier iCalendar
     #    Les heures seront converties dans local_tz_name pour l'affichage client
-    ical_content = create_ical_feed(scheduled_events, target_tz=local_tz_name)
+    #    (en mode streaming, la sérialisation a lieu pendant l'envoi de la réponse : sa durée
+    #    n'est connue qu'à la fin de l'envoi et n'apparaît que dans le log, voir _traced_stream)
+    trace.count('events_emitted', len(scheduled_events))
+    with trace.phase('serialize') if not stream else nullcontext():
+        ical_content = create_ical_feed(
+            scheduled_events, target_tz=local_tz_name,
+            include_vtimezone=app.config.get('FEED_INCLUDE_VTIMEZONE', False),
+            stream=stream
+        )
 
 
-    # 7. Renvoyer la réponse avec le bon type MIME
-    return Response(
-        ical_content,
-        mimetype='text/calendar',
-        headers={'Content-Disposition': 'attachment; filename=planning_genere.ics'} # Suggère un nom de fichier
-    )
+    return ical_content, etag, 'planning_genere.ics'
+
+
+def write_static_feed(path=None):
+    """
+    Exécute le pipeline complet et écrit le flux dans path (instance/feed.ics par défaut)
+    de façon atomique (fichier temporaire puis renommage) : la route ne sert jamais un
+    fichier partiellement écrit. Nécessite un contexte d'application.
+
+    Returns:
+        str: Le chemin du fichier écrit.
+    """
+    path = path or _static_feed_path()
+    ical_content, _, _ = build_feed()
+    atomic_write(path, ical_content)
+    print(f"Flux pré-généré écrit dans {path} ({len(ical_content)} octets).")
+    return path
+
+
+def _static_feed_loop(interval, stop_event):
+    """Régénère le flux pré-généré toutes les interval secondes (thread démon)."""
+    while True:
+        try:
+            with app.app_context():
+                write_static_feed()
+        except Exception as e:
+            print(f"Erreur lors de la génération du flux pré-généré: {e}")
+        if stop_event.wait(interval):
+            return
+
+
+# --- Commandes CLI (flask nexday ...) ---
+
+nexday_cli = AppGroup('nexday', help="Commandes de NexDay.")
+
+
+@nexday_cli.command('build-feed')
+@click.option('--output', default=None, help="Fichier à écrire (instance/feed.ics par défaut).")
+def build_feed_command(output):
+    """Génère le flux iCalendar complet et l'écrit atomiquement dans un fichier."""
+    write_static_feed(output)
+
+
+app.cli.add_command(nexday_cli)
+
+# Régénération périodique du flux pré-généré (FEED_STATIC_REFRESH_INTERVAL secondes)
+static_feed_stop = threading.Event()
+if app.config.get('FEED_STATIC_ENABLED') and app.config.get('FEED_STATIC_REFRESH_INTERVAL', 0) > 0:
+    threading.Thread(
+        target=_static_feed_loop,
+        args=(app.config['FEED_STATIC_REFRESH_INTERVAL'], static_feed_stop),
+        name='nexday-static-feed',
+        daemon=True
+    ).start()
 
 
 if __name__ == '__main__':
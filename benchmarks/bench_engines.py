@@ -0,0 +1,80 @@
+"""
+Compare les moteurs de placement 'greedy' et 'flow' (voir scheduler.py) sur des semaines
+synthétiques : durée, temps planifié (créneaux placés / demandés) et relaxations de catégorie
+(créneaux au-delà d'un par catégorie et par jour), sans puis avec contiguous_blocks.
+
+Usage (depuis la racine du dépôt) : python -m benchmarks.bench_engines [nombre de semaines]
+"""
+import contextlib
+import io
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytz
+
+import scheduler
+
+SEED = 3
+DEFAULT_WEEKS = 300
+TIMEZONES = ('Europe/Paris', 'UTC', 'America/New_York')
+CATEGORIES = ('sport', 'loisir', 'travail', 'etude')
+
+
+def _random_week(rng):
+    """Semaine synthétique : fuseau, bornes UTC, périodes occupées, activités, durée des créneaux."""
+    local_tz = pytz.timezone(rng.choice(TIMEZONES))
+    day = rng.choice([datetime(2026, 1, 5) + timedelta(weeks=rng.randrange(60)),
+                      datetime(2026, 3, 23), datetime(2026, 10, 19)]) # Dont des semaines de changement d'heure
+    week_start_utc = local_tz.localize(day).astimezone(pytz.utc)
+    week_end_utc = local_tz.localize(day + timedelta(days=6, hours=23, minutes=59)).astimezone(pytz.utc)
+    busy = []
+    for _ in range(rng.randrange(40)):
+        start = week_start_utc + timedelta(minutes=rng.randrange(7 * 24 * 60))
+        busy.append((start, start + timedelta(minutes=rng.choice([30, 60, 90, 120, 240]))))
+    activities = [
+        SimpleNamespace(id=index + 1, name=f"Activité {index + 1}", category=rng.choice(CATEGORIES),
+                        weekly_minutes=rng.choice([60, 120, 180, 240, 300, 600]))
+        for index in range(rng.randrange(1, 9))
+    ]
+    return local_tz, week_start_utc, week_end_utc, sorted(busy), activities, rng.choice([15, 30, 30, 60])
+
+
+def _relaxations(events, local_tz):
+    """Créneaux au-delà d'un par catégorie et par jour local."""
+    per_day = Counter((event['start_utc'].astimezone(local_tz).date(), event['category']) for event in events)
+    return sum(count - 1 for count in per_day.values())
+
+
+def main(week_count=DEFAULT_WEEKS):
+    weeks = [_random_week(random.Random(SEED * 1000003 + index)) for index in range(week_count)]
+    print(f"{week_count} semaines synthétiques (jusqu'à 8 activités et 40 périodes occupées) :")
+    print(f"  {'moteur':<24} {'durée':>9} {'max/semaine':>12} {'créneaux':>16} {'relaxations':>12}")
+    for contiguous_blocks in (False, True):
+        for engine in scheduler.SCHEDULER_ENGINES:
+            total = worst = 0.0
+            placed = requested = relaxations = 0
+            for local_tz, week_start_utc, week_end_utc, busy, activities, slot_minutes in weeks:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    started = time.perf_counter()
+                    events = scheduler.generate_schedule(
+                        activities, busy, week_start_utc, week_end_utc, local_tz_name=local_tz.zone,
+                        slot_duration_minutes=slot_minutes, engine=engine, contiguous_blocks=contiguous_blocks
+                    )
+                    elapsed = time.perf_counter() - started
+                total += elapsed
+                worst = max(worst, elapsed)
+                placed += len(events)
+                requested += sum(round(activity.weekly_minutes / slot_minutes) for activity in activities)
+                relaxations += _relaxations(events, local_tz)
+            label = engine + (' + blocs' if contiguous_blocks else '')
+            print(f"  {label:<24} {total * 1000:7.0f} ms {worst * 1000:9.1f} ms {placed:>7} / {requested:<7} {relaxations:>12}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_WEEKS)
+
+# --- Fin de bench_engines.py ---
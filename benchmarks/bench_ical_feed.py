@@ -0,0 +1,81 @@
+"""
+Mesure create_ical_feed (sérialisation directe, complète puis en flux) contre l'ancienne
+construction du flux avec les objets icalendar, sur un grand nombre d'événements.
+
+Usage (depuis la racine du dépôt) : python -m benchmarks.bench_ical_feed [nombre d'événements]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from icalendar import Calendar, Event
+
+from calendar_utils import create_ical_feed
+
+SEED = 20
+DEFAULT_EVENTS = 2500
+REPEATS = 5
+TARGET_TZ = 'Europe/Paris'
+NAMES = ('Sport', 'Lecture, roman; chapitre 3', 'Répétition générale — théâtre',
+         'Un nom très long qui dépasse largement les soixante-quinze octets autorisés par ligne')
+CATEGORIES = ('sport', 'loisir', 'travail', 'etude')
+
+
+def _icalendar_feed(scheduled_events, target_tz):
+    """Flux construit avec les objets icalendar, comme create_ical_feed avant la sérialisation directe."""
+    cal = Calendar()
+    cal.add('prodid', '-//Mon Planificateur Personnel//mxm.dk//')
+    cal.add('version', '2.0')
+    cal.add('calscale', 'GREGORIAN')
+    cal.add('method', 'PUBLISH')
+    timezone = pytz.timezone(target_tz)
+    for event_data in scheduled_events:
+        event = Event()
+        event.add('summary', event_data['name'])
+        event.add('dtstart', event_data['start_utc'].astimezone(timezone))
+        event.add('dtend', event_data['end_utc'].astimezone(timezone))
+        event.add('dtstamp', datetime.now(pytz.utc))
+        event.add('uid', f"{event_data['start_utc'].strftime('%Y%m%dT%H%M%SZ')}-{event_data['name']}@monplanificateur.perso")
+        if 'category' in event_data:
+            event.add('categories', [event_data['category']])
+        cal.add_component(event)
+    return cal.to_ical()
+
+
+def _best_of(function):
+    """Meilleure durée (ms) sur REPEATS exécutions, et taille du flux produit."""
+    best = None
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        size = len(function())
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, size
+
+
+def main(event_count=DEFAULT_EVENTS):
+    rng = random.Random(SEED)
+    events = []
+    for _ in range(event_count):
+        start_utc = datetime(2026, 1, 1, tzinfo=pytz.utc) + timedelta(minutes=15 * rng.randrange(365 * 96))
+        events.append({'name': rng.choice(NAMES), 'category': rng.choice(CATEGORIES), 'start_utc': start_utc,
+                       'end_utc': start_utc + timedelta(minutes=rng.choice([30, 60, 120]))})
+    print(f"{event_count} événements, fuseau {TARGET_TZ} (meilleur de {REPEATS}) :")
+    results = [
+        ('icalendar', lambda: _icalendar_feed(events, TARGET_TZ)),
+        ('create_ical_feed', lambda: create_ical_feed(events, target_tz=TARGET_TZ)),
+        ('create_ical_feed (flux)', lambda: b''.join(create_ical_feed(events, target_tz=TARGET_TZ, stream=True))),
+    ]
+    reference_ms = None
+    for label, function in results:
+        elapsed_ms, size = _best_of(function)
+        reference_ms = reference_ms or elapsed_ms
+        print(f"  {label:<26} {elapsed_ms:8.1f} ms {size:>10} octets  x{reference_ms / elapsed_ms:.1f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_EVENTS)
+
+# --- Fin de bench_ical_feed.py ---
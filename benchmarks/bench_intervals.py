@@ -0,0 +1,77 @@
+"""
+Micro-benchmarks d'IntervalSet sur 100 000 intervalles aléatoires (voir intervals.py).
+
+Usage (depuis la racine du dépôt) : python -m benchmarks.bench_intervals [nombre d'intervalles]
+"""
+import random
+import sys
+import time
+from datetime import timedelta
+
+from intervals import IntervalSet
+
+SEED = 7
+DEFAULT_SIZE = 100000
+HORIZON_US = 365 * 24 * 3600 * 1000000 # Intervalles répartis sur un an
+MAX_DURATION_US = 10 * 60 * 1000000
+
+
+def _random_pairs(rng, size):
+    """Paires (début, fin) en microsecondes, non triées, de 0 à 10 min."""
+    pairs = []
+    for _ in range(size):
+        start = rng.randrange(HORIZON_US)
+        pairs.append((start, start + rng.randrange(1, MAX_DURATION_US)))
+    return pairs
+
+
+def _list_merge(pairs):
+    """Référence : l'ancienne boucle « trier puis fusionner » sur une liste de tuples."""
+    merged = []
+    for start, end in sorted(pairs):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _timed(label, function, repeat=3):
+    """Exécute function repeat fois et affiche la meilleure durée ; retourne son résultat."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<28} {best * 1000:8.1f} ms")
+    return result
+
+
+def main(size=DEFAULT_SIZE):
+    rng = random.Random(SEED)
+    pairs = _random_pairs(rng, size)
+    other_pairs = _random_pairs(rng, size)
+    print(f"IntervalSet, {size} intervalles aléatoires sur un an :")
+
+    _timed("liste triée + fusion (réf.)", lambda: _list_merge(pairs))
+    busy = _timed("from_pairs", lambda: IntervalSet.from_pairs(pairs))
+    other = IntervalSet.from_pairs(other_pairs)
+    _timed("union", lambda: busy.union(other))
+    _timed("intersect", lambda: busy.intersect(other))
+    _timed("subtract", lambda: busy.subtract(other))
+    _timed("dilate (1 h)", lambda: busy.dilate(timedelta(hours=1)))
+    week_start = HORIZON_US // 2
+    _timed("clip (une semaine)", lambda: busy.clip(week_start, week_start + 7 * 24 * 3600 * 1000000))
+    probes = [rng.randrange(HORIZON_US) for _ in range(size)]
+    _timed(f"overlaps x {size}", lambda: [busy.overlaps(start, start + 1800 * 1000000) for start in probes])
+
+    stored_bytes = busy.starts.itemsize * len(busy.starts) + busy.ends.itemsize * len(busy.ends)
+    print(f"  {len(busy)} intervalles après fusion, {stored_bytes / len(busy):.0f} octets par intervalle")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE)
+
+# --- Fin de bench_intervals.py ---
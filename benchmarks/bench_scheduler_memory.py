@@ -0,0 +1,50 @@
+"""
+Mémoire de pointe (tracemalloc) d'un appel à generate_schedule sur une longue période à
+créneaux fins : 12 semaines, créneaux de 5 minutes, 8 activités, modèle de semaine déjà en cache.
+
+Usage (depuis la racine du dépôt) : python -m benchmarks.bench_scheduler_memory
+"""
+import contextlib
+import io
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytz
+
+import scheduler
+
+SEED = 1
+WEEKS = 12
+SLOT_MINUTES = 5
+BUSY_PERIODS = 100
+
+
+def main():
+    rng = random.Random(SEED)
+    week_start_utc = datetime(2026, 10, 18, 22, tzinfo=pytz.utc)
+    week_end_utc = week_start_utc + timedelta(weeks=WEEKS)
+    busy = sorted(
+        (start, start + timedelta(minutes=rng.choice([15, 30, 60])))
+        for start in (week_start_utc + timedelta(minutes=rng.randrange(WEEKS * 7 * 24 * 60)) for _ in range(BUSY_PERIODS))
+    )
+    activities = [SimpleNamespace(id=index, name=f"Activité {index}", weekly_minutes=3000, category=f"c{index % 3}")
+                  for index in range(8)]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Premier appel : remplit le cache du modèle de semaine, exclu de la mesure
+        scheduler.generate_schedule(activities, busy, week_start_utc, week_end_utc, slot_duration_minutes=SLOT_MINUTES)
+        tracemalloc.start()
+        events = scheduler.generate_schedule(activities, busy, week_start_utc, week_end_utc, slot_duration_minutes=SLOT_MINUTES)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"generate_schedule, {WEEKS} semaines, créneaux de {SLOT_MINUTES} min, {len(activities)} activités :")
+    print(f"  {len(events)} événements planifiés")
+    print(f"  pic mémoire {peak // 1024} Kio, conservé après l'appel {retained // 1024} Kio (les événements retournés)")
+
+
+if __name__ == '__main__':
+    main()
+
+# --- Fin de bench_scheduler_memory.py ---
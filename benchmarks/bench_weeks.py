@@ -0,0 +1,65 @@
+"""
+Mesure generate_schedule(weeks=...) sur des horizons de 1 à 52 semaines : durée du premier
+appel (caches du gabarit de semaine vides) et meilleure durée des appels suivants, par semaine.
+
+Usage (depuis la racine du dépôt) : python -m benchmarks.bench_weeks [semaines ...]
+"""
+import contextlib
+import io
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytz
+
+import scheduler
+
+SEED = 24
+DEFAULT_WEEKS = (1, 4, 13, 26, 52)
+REPEATS = 5
+BUSY_PER_WEEK = 40
+LOCAL_TZ_NAME = 'Europe/Paris'
+ACTIVITIES = [
+    SimpleNamespace(id=index + 1, name=f"Activité {index + 1}", category=category, weekly_minutes=minutes)
+    for index, (category, minutes) in enumerate([('sport', 180), ('sport', 120), ('loisir', 240),
+                                                  ('travail', 300), ('etude', 600), ('etude', 60)])
+]
+
+
+def _busy_times(rng, week_start_utc, week_count):
+    """BUSY_PER_WEEK périodes occupées aléatoires par semaine, sur tout l'horizon."""
+    busy = []
+    for _ in range(BUSY_PER_WEEK * week_count):
+        start = week_start_utc + timedelta(minutes=rng.randrange(week_count * 7 * 24 * 60))
+        busy.append((start, start + timedelta(minutes=rng.choice([30, 60, 90, 120, 240]))))
+    return sorted(busy)
+
+
+def _run(busy, week_start_utc, week_end_utc, week_count):
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        events = scheduler.generate_schedule(ACTIVITIES, busy, week_start_utc, week_end_utc,
+                                             local_tz_name=LOCAL_TZ_NAME, weeks=week_count)
+        return time.perf_counter() - started, len(events)
+
+
+def main(week_counts=DEFAULT_WEEKS):
+    local_tz = pytz.timezone(LOCAL_TZ_NAME)
+    week_start_utc = local_tz.localize(datetime(2026, 1, 5)).astimezone(pytz.utc)
+    week_end_utc = local_tz.localize(datetime(2026, 1, 11, 23, 59)).astimezone(pytz.utc)
+    print(f"{len(ACTIVITIES)} activités, {BUSY_PER_WEEK} périodes occupées par semaine, fuseau {LOCAL_TZ_NAME} :")
+    print(f"  {'semaines':>8} {'premier appel':>14} {'meilleur':>11} {'par semaine':>12} {'créneaux':>9}")
+    for week_count in week_counts:
+        busy = _busy_times(random.Random(SEED * 1000003 + week_count), week_start_utc, week_count)
+        scheduler._relative_week_template.cache_clear()
+        first, placed = _run(busy, week_start_utc, week_end_utc, week_count)
+        best = min(_run(busy, week_start_utc, week_end_utc, week_count)[0] for _ in range(REPEATS))
+        print(f"  {week_count:>8} {first * 1000:11.1f} ms {best * 1000:8.1f} ms {best * 1000 / week_count:9.2f} ms {placed:>9}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_WEEKS)
+
+# --- Fin de bench_weeks.py ---
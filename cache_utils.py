@@ -0,0 +1,45 @@
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Cache en mémoire à éviction LRU (l'entrée la moins récemment utilisée est supprimée
+    en premier), utilisable depuis plusieurs threads.
+    """
+
+    def __init__(self, max_entries=128):
+        """
+        Args:
+            max_entries (int): Nombre maximum d'entrées conservées.
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Retourne la valeur associée à key (et la marque comme récemment utilisée), ou default."""
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                return default
+            return self._entries[key]
+
+    def set(self, key, value):
+        """Associe value à key, en évinçant les entrées les plus anciennes si nécessaire."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Vide le cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+# --- Fin de cache_utils.py ---
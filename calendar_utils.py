@@ -1,9 +1,259 @@
+import os
+import re
+import json
+import hashlib
+import tempfile
+import threading
 import requests
-from icalendar import Calendar, Event
+from requests.adapters import HTTPAdapter
+from cache_utils import LRUCache
+from intervals import IntervalSet
+from tz_utils import OffsetTable
+from tracing import current_trace, TimedChunks
+from icalendar import Calendar, Timezone
+from icalendar.timezone import tzid_from_tzinfo
+from icalendar.parser import Contentline
+from icalendar.prop import vDDDTypes
 from datetime import datetime, date, timedelta, time
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+from contextvars import copy_context
+import time as time_module # 'time' est déjà importé depuis datetime
 import pytz # Pour les fuseaux horaires
 
-def get_busy_times(calendar_url, start_date, end_date, target_tz='UTC'):
+# --- Session HTTP partagée ---
+# Une seule session (pools keep-alive par hôte) est réutilisée par toutes les requêtes
+# et toutes les sources, ce qui évite une nouvelle poignée de main TCP+TLS à chaque téléchargement.
+_http_session = None
+_http_session_lock = threading.Lock()
+_http_session_options = {
+    'pool_connections': 10, # Nombre d'hôtes dont le pool est conservé
+    'pool_maxsize': 10,     # Connexions keep-alive maximum par hôte
+    'max_retries': 0,
+}
+CHUNK_SIZE = 64 * 1024 # Taille des morceaux lus lors des téléchargements en flux
+SPOOL_MAX_MEMORY = 1024 * 1024 # Au-delà, le contenu mis de côté avant parsing passe sur disque
+
+
+def configure_http_session(pool_connections=10, pool_maxsize=10, max_retries=0):
+    """
+    (Re)configure la session HTTP partagée utilisée pour télécharger les calendriers.
+    La session existante est fermée ; la suivante sera créée avec ces paramètres.
+
+    Args:
+        pool_connections (int): Nombre de pools (un par hôte) conservés.
+        pool_maxsize (int): Nombre maximum de connexions conservées par hôte.
+        max_retries (int): Nombre de nouvelles tentatives en cas d'échec de connexion.
+    """
+    global _http_session
+    with _http_session_lock:
+        _http_session_options.update(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=max_retries
+        )
+        if _http_session is not None:
+            _http_session.close()
+        _http_session = None
+
+
+def get_http_session():
+    """Retourne la session HTTP partagée, en la créant au premier appel."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(**_http_session_options)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['Accept-Encoding'] = 'gzip, deflate' # Sources compressées si le serveur le permet
+            _http_session = session
+        return _http_session
+
+
+def _calendar_cache_paths(cache_dir, calendar_url):
+    """Retourne les chemins (contenu, métadonnées) du cache disque pour une URL."""
+    key = hashlib.sha256(calendar_url.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f"{key}.ics"), os.path.join(cache_dir, f"{key}.json")
+
+
+def _default_file_mode():
+    """Droits d'un fichier créé normalement (0666 moins le umask du processus)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+# Lu une seule fois à l'import : os.umask modifie brièvement un réglage global au processus
+_FILE_MODE = _default_file_mode()
+
+
+def atomic_write(path, data):
+    """
+    Écrit data (bytes) dans path via un fichier temporaire puis un renommage atomique.
+    Le fichier reçoit les droits habituels (0644 avec le umask courant, et non les 0600 de
+    mkstemp) pour rester lisible par un serveur statique qui tourne sous un autre utilisateur.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.chmod(tmp_path, _FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _iter_file_chunks(path, chunk_size=CHUNK_SIZE):
+    """Lit un fichier par morceaux de chunk_size octets."""
+    with open(path, 'rb') as body_file:
+        while True:
+            chunk = body_file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _load_cached_calendar(cache_dir, calendar_url):
+    """
+    Charge les métadonnées mises en cache pour une URL, après avoir vérifié (par morceaux)
+    que le contenu stocké correspond à l'empreinte enregistrée.
+
+    Returns:
+        dict: Les métadonnées, ou None si le cache est absent ou incohérent.
+    """
+    body_path, meta_path = _calendar_cache_paths(cache_dir, calendar_url)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+        digest = hashlib.sha256()
+        for chunk in _iter_file_chunks(body_path):
+            digest.update(chunk)
+    except (OSError, ValueError):
+        return None
+    if meta.get('sha256') != digest.hexdigest():
+        return None
+    return meta
+
+
+def _iter_response_chunks(response, calendar_url, cache_dir, chunk_size):
+    """Produit le corps d'une réponse 200 par morceaux, en l'enregistrant au passage dans le cache disque."""
+    with response:
+        if not cache_dir:
+            yield from response.iter_content(chunk_size)
+            return
+
+        body_path, meta_path = _calendar_cache_paths(cache_dir, calendar_url)
+        # Écrire le contenu dans un fichier temporaire au fil de l'eau, puis l'installer atomiquement
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='.tmp-')
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in response.iter_content(chunk_size):
+                    tmp_file.write(chunk)
+                    digest.update(chunk)
+                    yield chunk
+            os.replace(tmp_path, body_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        meta = {
+            'url': calendar_url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'sha256': digest.hexdigest(),
+        }
+        try:
+            atomic_write(meta_path, json.dumps(meta).encode('utf-8'))
+        except OSError as e:
+            print(f"Avertissement: Impossible d'écrire le cache du calendrier: {e}")
+
+
+def open_calendar(calendar_url, cache_dir=None, timeout=10, chunk_size=CHUNK_SIZE):
+    """
+    Lance le téléchargement d'un calendrier iCal et retourne son contenu sous forme de flux
+    de morceaux, sans jamais le charger entièrement en mémoire.
+
+    Si cache_dir est fourni, le contenu et ses validateurs (ETag / Last-Modified) sont
+    conservés sur disque et la requête devient conditionnelle (If-None-Match /
+    If-Modified-Since) : une réponse 304 relit le contenu stocké sans le retélécharger.
+
+    Args:
+        calendar_url (str): URL du fichier .ics public.
+        cache_dir (str): Dossier du cache disque (None pour désactiver le cache).
+        timeout (float): Timeout de la requête HTTP en secondes.
+        chunk_size (int): Taille des morceaux produits, en octets.
+
+    Returns:
+        tuple: (empreinte SHA-256 du contenu si elle est déjà connue (réponse 304) sinon None,
+                itérateur des morceaux bytes successifs du fichier .ics).
+
+    Raises:
+        requests.exceptions.RequestException: En cas d'erreur réseau ou HTTP.
+    """
+    headers = {}
+    cached_meta = None
+    if cache_dir:
+        cached_meta = _load_cached_calendar(cache_dir, calendar_url)
+        if cached_meta:
+            if cached_meta.get('etag'):
+                headers['If-None-Match'] = cached_meta['etag']
+            if cached_meta.get('last_modified'):
+                headers['If-Modified-Since'] = cached_meta['last_modified']
+
+    response = get_http_session().get(calendar_url, headers=headers, timeout=timeout, stream=True)
+    if response.status_code == 304 and cached_meta is not None:
+        # Source inchangée : relire le contenu stocké
+        response.close()
+        body_path, _meta_path = _calendar_cache_paths(cache_dir, calendar_url)
+        return cached_meta['sha256'], _iter_file_chunks(body_path, chunk_size)
+    try:
+        response.raise_for_status() # Lève une exception pour les erreurs HTTP (4xx, 5xx)
+    except requests.exceptions.RequestException:
+        response.close()
+        raise
+    return None, _iter_response_chunks(response, calendar_url, cache_dir, chunk_size)
+
+
+def iter_calendar_chunks(calendar_url, cache_dir=None, timeout=10, chunk_size=CHUNK_SIZE):
+    """
+    Télécharge un calendrier iCal et en produit le contenu brut par morceaux (voir open_calendar).
+
+    Yields:
+        bytes: Les morceaux successifs du fichier .ics.
+
+    Raises:
+        requests.exceptions.RequestException: En cas d'erreur réseau ou HTTP.
+    """
+    _digest, chunks = open_calendar(calendar_url, cache_dir=cache_dir, timeout=timeout, chunk_size=chunk_size)
+    yield from chunks
+
+
+def download_calendar(calendar_url, cache_dir=None, timeout=10):
+    """
+    Télécharge le contenu brut complet d'un calendrier iCal (voir iter_calendar_chunks).
+
+    Args:
+        calendar_url (str): URL du fichier .ics public.
+        cache_dir (str): Dossier du cache disque (None pour désactiver le cache).
+        timeout (float): Timeout de la requête HTTP en secondes.
+
+    Returns:
+        bytes: Le contenu du fichier .ics.
+
+    Raises:
+        requests.exceptions.RequestException: En cas d'erreur réseau ou HTTP.
+    """
+    return b''.join(iter_calendar_chunks(calendar_url, cache_dir=cache_dir, timeout=timeout))
+
+
+def get_busy_times(calendar_url, start_date, end_date, target_tz='UTC', cache_dir=None, parser='full'):
     """
     Télécharge et parse un calendrier iCal pour trouver les plages horaires occupées
     entre start_date et end_date (inclusives).
@@ -13,6 +263,8 @@ def get_busy_times(calendar_url, start_date, end_date, target_tz='UTC'):
         start_date (datetime.date): Date de début de la période.
         end_date (datetime.date): Date de fin de la période.
         target_tz (str): Fuseau horaire cible pour normaliser les heures (ex: 'Europe/Paris').
+        cache_dir (str): Dossier du cache HTTP conditionnel (None pour désactiver le cache).
+        parser (str): 'full' (arbre icalendar complet) ou 'stream' (scanner VEVENT par morceaux).
 
     Returns:
         list: Une liste de tuples [(start_datetime_utc, end_datetime_utc), ...],
@@ -24,143 +276,607 @@ def get_busy_times(calendar_url, start_date, end_date, target_tz='UTC'):
         return []
 
     try:
-        response = requests.get(calendar_url, timeout=10) # Timeout de 10s
-        response.raise_for_status() # Lève une exception pour les erreurs HTTP (4xx, 5xx)
+        return load_busy_times(calendar_url, start_date, end_date, target_tz=target_tz,
+                               cache_dir=cache_dir, parser=parser)
     except requests.exceptions.RequestException as e:
         print(f"Erreur lors du téléchargement du calendrier: {e}")
         return []
-
-    try:
-        cal = Calendar.from_ical(response.text)
     except Exception as e:
         print(f"Erreur lors du parsing du calendrier iCal: {e}")
         return []
 
-    busy_periods_utc = []
-    target_timezone = pytz.timezone(target_tz)
 
+def load_busy_times(calendar_url, start_date, end_date, target_tz='UTC', cache_dir=None, parser='full'):
+    """
+    Comme get_busy_times, mais laisse remonter les erreurs de téléchargement et de parsing
+    (utile pour distinguer un échec d'un calendrier vide).
+
+    Si le cache des périodes parsées est configuré (configure_busy_times_cache), un contenu
+    déjà vu pour la même fenêtre et le même fuseau n'est pas reparsé. Après une réponse 304,
+    l'empreinte est connue sans même relire le contenu stocké ; après une réponse 200, le
+    contenu est d'abord téléchargé entièrement (mis de côté sur disque au-delà de
+    SPOOL_MAX_MEMORY) pour calculer l'empreinte, puis parsé seulement s'il est absent du cache.
+
+    Raises:
+        requests.exceptions.RequestException: En cas d'erreur réseau ou HTTP.
+        ValueError: Si le contenu n'est pas un calendrier iCal valide.
+    """
+    trace = current_trace()
+    started = time_module.perf_counter()
+    digest, chunks = open_calendar(calendar_url, cache_dir=cache_dir, timeout=10) # Timeout de 10s
+    if trace.enabled:
+        # Le parseur consomme les morceaux au fil du téléchargement : le temps passé à les
+        # obtenir est compté en download, le reste en parse
+        opened = time_module.perf_counter() - started
+        chunks = timed_chunks = TimedChunks(chunks)
+
+    cache = _busy_times_cache
+    if cache is None:
+        busy_times = _parse_chunks(chunks, start_date, end_date, target_tz, parser)
+    elif digest is None and parser == 'stream':
+        # Réponse 200 (source sans validateurs, ou contenu identique renvoyé) : mettre le contenu
+        # de côté en calculant son empreinte, sans le charger entièrement en mémoire. Le fichier
+        # du cache HTTP n'est pas relu : un rafraîchissement simultané de la même URL peut le remplacer.
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as spool:
+            hasher = hashlib.sha256()
+            for chunk in chunks:
+                hasher.update(chunk)
+                spool.write(chunk)
+            key = (hasher.hexdigest(), start_date.isoformat(), end_date.isoformat(), target_tz)
+            busy_times = cache.get(key)
+            if busy_times is None:
+                spool.seek(0)
+                busy_times = _parse_chunks(iter(lambda: spool.read(CHUNK_SIZE), b''), start_date, end_date, target_tz, parser)
+                cache.set(key, busy_times)
+    else:
+        if digest is None:
+            # Parseur complet : le contenu est de toute façon assemblé en mémoire
+            content = b''.join(chunks)
+            digest = hashlib.sha256(content).hexdigest()
+            chunks = (content,)
+        key = (digest, start_date.isoformat(), end_date.isoformat(), target_tz)
+        busy_times = cache.get(key)
+        if busy_times is None:
+            busy_times = _parse_chunks(chunks, start_date, end_date, target_tz, parser)
+            cache.set(key, busy_times)
+
+    if trace.enabled:
+        download = opened + timed_chunks.elapsed
+        trace.add_duration('download', download)
+        trace.count('bytes_fetched', timed_chunks.size)
+        trace.add_duration('parse', time_module.perf_counter() - started - download)
+    return busy_times
+
+
+def _parse_chunks(chunks, start_date, end_date, target_tz, parser):
+    """Parse un flux de morceaux avec le parseur demandé ('full' ou 'stream')."""
+    if parser == 'stream':
+        return scan_busy_times(chunks, start_date, end_date, target_tz=target_tz)
+    return parse_busy_times(b''.join(chunks), start_date, end_date, target_tz=target_tz)
+
+
+# --- Cache des périodes occupées parsées ---
+
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=pytz.utc)
+
+
+class BusyTimesCache:
+    """
+    Cache des périodes occupées fusionnées, indexé par (empreinte SHA-256 du contenu,
+    date de début, date de fin, fuseau cible). Niveau mémoire à éviction LRU et
+    niveau disque optionnel (un fichier JSON par clé), borné à max_disk_entries fichiers :
+    les moins récemment utilisés (date de modification) sont supprimés.
+    """
+
+    def __init__(self, max_entries=64, cache_dir=None, max_disk_entries=256):
+        """
+        Args:
+            max_entries (int): Nombre maximum d'entrées conservées en mémoire.
+            cache_dir (str): Dossier du niveau disque (None pour le désactiver).
+            max_disk_entries (int): Nombre maximum de fichiers du niveau disque.
+        """
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self._memory = LRUCache(max_entries)
+
+    def _disk_path(self, key):
+        name = hashlib.sha256('|'.join(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def get(self, key):
+        """Retourne une copie de la liste des périodes en cache pour key, ou None."""
+        busy_times = self._memory.get(key)
+        if busy_times is None and self.cache_dir:
+            disk_path = self._disk_path(key)
+            try:
+                with open(disk_path, 'r', encoding='utf-8') as cache_file:
+                    stored = json.load(cache_file)
+                os.utime(disk_path) # Entrée récemment utilisée : la dernière à être évincée
+            except (OSError, ValueError):
+                return None
+            # Microsecondes depuis l'epoch : conversion exacte dans les deux sens
+            busy_times = tuple(
+                (_EPOCH_UTC + timedelta(microseconds=start_us), _EPOCH_UTC + timedelta(microseconds=end_us))
+                for start_us, end_us in stored['busy_times']
+            )
+            self._memory.set(key, busy_times)
+        return list(busy_times) if busy_times is not None else None
+
+    def set(self, key, busy_times):
+        """Enregistre la liste des périodes (datetimes UTC) associée à key."""
+        self._memory.set(key, tuple(busy_times))
+        if self.cache_dir:
+            stored = {'busy_times': [
+                [(start - _EPOCH_UTC) // timedelta(microseconds=1), (end - _EPOCH_UTC) // timedelta(microseconds=1)]
+                for start, end in busy_times
+            ]}
+            try:
+                atomic_write(self._disk_path(key), json.dumps(stored).encode('utf-8'))
+                self._prune_disk()
+            except OSError as e:
+                print(f"Avertissement: Impossible d'écrire le cache des périodes occupées: {e}")
+
+    def _prune_disk(self):
+        """Supprime les fichiers les moins récemment utilisés au-delà de max_disk_entries."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.json'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    pass # Supprimé entre-temps par un autre processus
+        if len(entries) <= self.max_disk_entries:
+            return
+        entries.sort()
+        for _mtime, path in entries[:len(entries) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_busy_times_cache = None
+
+
+def configure_busy_times_cache(max_entries=64, cache_dir=None, max_disk_entries=256):
+    """
+    Active (ou désactive avec max_entries=0) le cache des périodes occupées parsées.
+
+    Args:
+        max_entries (int): Nombre maximum d'entrées conservées en mémoire.
+        cache_dir (str): Dossier du niveau disque (None pour le désactiver).
+        max_disk_entries (int): Nombre maximum de fichiers du niveau disque.
+    """
+    global _busy_times_cache
+    _busy_times_cache = BusyTimesCache(max_entries, cache_dir, max_disk_entries) if max_entries > 0 else None
+
+
+def _window_offset_table(start_date, end_date, target_timezone):
+    """Table des décalages UTC du fuseau cible couvrant la période demandée (voir tz_utils)."""
+    return OffsetTable(
+        target_timezone,
+        datetime.combine(start_date, time.min, tzinfo=pytz.utc),
+        datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=pytz.utc)
+    )
+
+
+def _busy_window_utc(start_date, end_date, offset_table):
+    """Retourne la période [début du premier jour, fin du dernier jour] du fuseau cible, en UTC."""
     # Convertir les dates de début/fin en datetime au début/fin de journée dans le fuseau horaire cible
     # Puis convertir en UTC pour la comparaison, car icalendar retourne souvent en UTC ou sans TZ
-    start_dt_local = target_timezone.localize(datetime.combine(start_date, time.min))
-    end_dt_local = target_timezone.localize(datetime.combine(end_date, time.max))
-    start_dt_utc = start_dt_local.astimezone(pytz.utc)
-    end_dt_utc = end_dt_local.astimezone(pytz.utc)
+    start_dt_utc = offset_table.localize(datetime.combine(start_date, time.min))
+    end_dt_utc = offset_table.localize(datetime.combine(end_date, time.max))
+    return start_dt_utc, end_dt_utc
 
 
+def _event_period_utc(start_time, end_time, offset_table, start_dt_utc, end_dt_utc):
+    """
+    Convertit les valeurs DTSTART/DTEND d'un événement en période UTC tronquée à la fenêtre.
+
+    Returns:
+        tuple: (start_utc, end_utc), ou None si l'événement est hors fenêtre ou de type non géré.
+    """
+    # Gérer les dates simples (événements sur toute la journée)
+    # Si c'est une date sans heure, on considère toute la journée comme occupée
+    if isinstance(start_time, date) and not isinstance(start_time, datetime):
+         # Convertir la date en datetime au début du jour dans le fuseau cible, puis UTC
+         # (table des décalages précalculée plutôt que localize/astimezone)
+        start_time_utc = offset_table.localize(datetime.combine(start_time, time.min))
+         # Pour la fin, prendre la date de fin (qui est exclusive dans ce cas) ou dtstart + 1 jour
+        if isinstance(end_time, date) and not isinstance(end_time, datetime):
+            end_dt_date = end_time
+        else:
+            end_dt_date = start_time + timedelta(days=1) # Fin exclusive
+
+        end_time_utc = offset_table.localize(datetime.combine(end_dt_date, time.min))
+
+    # Gérer les datetime avec ou sans fuseau horaire
+    elif isinstance(start_time, datetime):
+        # Si pas de fuseau horaire, supposer UTC (comportement courant d'icalendar)
+        if start_time.tzinfo is None or start_time.tzinfo.utcoffset(start_time) is None:
+            start_time_utc = pytz.utc.localize(start_time)
+        else:
+            start_time_utc = start_time.astimezone(pytz.utc)
+
+        if end_time.tzinfo is None or end_time.tzinfo.utcoffset(end_time) is None:
+            end_time_utc = pytz.utc.localize(end_time)
+        else:
+            end_time_utc = end_time.astimezone(pytz.utc)
+    else:
+         return None # Type de date non géré
+
+
+    # Vérifier si l'événement chevauche la période demandée [start_dt_utc, end_dt_utc]
+    # L'événement est pertinent si : event_start < period_end ET event_end > period_start
+    if start_time_utc < end_dt_utc and end_time_utc > start_dt_utc:
+         # Tronquer l'événement aux limites de la période si nécessaire
+        actual_start = max(start_time_utc, start_dt_utc)
+        actual_end = min(end_time_utc, end_dt_utc)
+        if actual_start < actual_end: # Ignorer les événements de durée nulle après troncature
+            return actual_start, actual_end
+    return None
+
+
+def _merge_busy_periods(busy_periods_utc):
+    """Trie et fusionne les périodes qui se chevauchent ou sont adjacentes."""
+    # print(f"Périodes occupées fusionnées (UTC): {merged_busy_periods}") # Debug
+    return IntervalSet.from_datetimes(busy_periods_utc).to_datetimes()
+
+
+def busy_times_digest(busy_times):
+    """Empreinte SHA-256 (hexadécimale) d'une liste de périodes occupées (start_utc, end_utc)."""
+    busy = IntervalSet.coerce(busy_times)
+    return hashlib.sha256(busy.starts.tobytes() + busy.ends.tobytes()).hexdigest()
+
+
+def parse_busy_times(content, start_date, end_date, target_tz='UTC'):
+    """
+    Parse le contenu d'un calendrier iCal et retourne les plages horaires occupées
+    entre start_date et end_date (inclusives), triées et fusionnées.
+
+    Args:
+        content (bytes | str): Contenu du fichier .ics.
+        start_date (datetime.date): Date de début de la période.
+        end_date (datetime.date): Date de fin de la période.
+        target_tz (str): Fuseau horaire cible pour normaliser les heures (ex: 'Europe/Paris').
+
+    Returns:
+        list: Une liste de tuples [(start_datetime_utc, end_datetime_utc), ...] en UTC.
+
+    Raises:
+        ValueError: Si le contenu n'est pas un calendrier iCal valide.
+    """
+    cal = Calendar.from_ical(content)
+
+    busy_periods_utc = []
+    offset_table = _window_offset_table(start_date, end_date, pytz.timezone(target_tz))
+    start_dt_utc, end_dt_utc = _busy_window_utc(start_date, end_date, offset_table)
+
+    vevent_count = 0
     for component in cal.walk():
         if component.name == "VEVENT":
+            vevent_count += 1
             dtstart = component.get('dtstart')
             dtend = component.get('dtend')
 
             if not dtstart or not dtend:
                 continue # Événement incomplet
 
-            start_time = dtstart.dt
-            end_time = dtend.dt
-
-            # Gérer les dates simples (événements sur toute la journée)
-            # Si c'est une date sans heure, on considère toute la journée comme occupée
-            if isinstance(start_time, date) and not isinstance(start_time, datetime):
-                 # Convertir la date en datetime au début du jour dans le fuseau cible, puis UTC
-                start_time_local = target_timezone.localize(datetime.combine(start_time, time.min))
-                 # Pour la fin, prendre la date de fin (qui est exclusive dans ce cas) ou dtstart + 1 jour
-                if isinstance(end_time, date) and not isinstance(end_time, datetime):
-                    end_dt_date = end_time
-                else:
-                    end_dt_date = start_time + timedelta(days=1) # Fin exclusive
-
-                end_time_local = target_timezone.localize(datetime.combine(end_dt_date, time.min))
-                start_time_utc = start_time_local.astimezone(pytz.utc)
-                end_time_utc = end_time_local.astimezone(pytz.utc)
-
-            # Gérer les datetime avec ou sans fuseau horaire
-            elif isinstance(start_time, datetime):
-                # Si pas de fuseau horaire, supposer UTC (comportement courant d'icalendar)
-                if start_time.tzinfo is None or start_time.tzinfo.utcoffset(start_time) is None:
-                    start_time_utc = pytz.utc.localize(start_time)
-                else:
-                    start_time_utc = start_time.astimezone(pytz.utc)
-
-                if end_time.tzinfo is None or end_time.tzinfo.utcoffset(end_time) is None:
-                    end_time_utc = pytz.utc.localize(end_time)
-                else:
-                    end_time_utc = end_time.astimezone(pytz.utc)
-            else:
-                 continue # Type de date non géré
-
-
-            # Vérifier si l'événement chevauche la période demandée [start_dt_utc, end_dt_utc]
-            # L'événement est pertinent si : event_start < period_end ET event_end > period_start
-            if start_time_utc < end_dt_utc and end_time_utc > start_dt_utc:
-                 # Tronquer l'événement aux limites de la période si nécessaire
-                actual_start = max(start_time_utc, start_dt_utc)
-                actual_end = min(end_time_utc, end_dt_utc)
-                if actual_start < actual_end: # Ignorer les événements de durée nulle après troncature
-                    busy_periods_utc.append((actual_start, actual_end))
-
-    # Trier les périodes occupées
-    busy_periods_utc.sort()
-
-    # Fusionner les périodes qui se chevauchent ou sont adjacentes
-    if not busy_periods_utc:
-        return []
+            period = _event_period_utc(dtstart.dt, dtend.dt, offset_table, start_dt_utc, end_dt_utc)
+            if period is not None:
+                busy_periods_utc.append(period)
 
-    merged_busy_periods = []
-    current_start, current_end = busy_periods_utc[0]
+    current_trace().count('vevents_scanned', vevent_count)
+    return _merge_busy_periods(busy_periods_utc)
 
-    for next_start, next_end in busy_periods_utc[1:]:
-        if next_start <= current_end: # Chevauchement ou adjacence
-            current_end = max(current_end, next_end) # Étendre la période courante
-        else:
-            merged_busy_periods.append((current_start, current_end))
-            current_start, current_end = next_start, next_end
 
-    merged_busy_periods.append((current_start, current_end)) # Ajouter la dernière période
+def _iter_content_lines(chunks):
+    """
+    Découpe un flux de morceaux bytes en lignes de contenu iCalendar « dépliées »
+    (RFC 5545 §3.1 : une ligne commençant par un espace ou une tabulation prolonge la précédente).
+    """
+    pending = b''
+    remainder = b''
+    for chunk in chunks:
+        lines = (remainder + chunk).split(b'\n')
+        remainder = lines.pop() # Ligne incomplète, complétée par le morceau suivant
+        for line in lines:
+            if line.endswith(b'\r'):
+                line = line[:-1]
+            if line[:1] in (b' ', b'\t'):
+                pending += line[1:]
+                continue
+            if pending:
+                yield pending
+            pending = line
+    if remainder.endswith(b'\r'):
+        remainder = remainder[:-1]
+    if remainder[:1] in (b' ', b'\t'):
+        pending += remainder[1:]
+    elif remainder:
+        if pending:
+            yield pending
+        pending = remainder
+    if pending:
+        yield pending
+
+
+def _scanned_value(line):
+    """Décode une ligne DTSTART/DTEND comme le ferait Calendar.from_ical (même type de valeur)."""
+    _name, params, value = Contentline(line.decode('utf-8', 'replace')).parts()
+    if 'TZID' in params:
+        return vDDDTypes.from_ical(value, params['TZID'])
+    return vDDDTypes.from_ical(value)
+
+
+def scan_busy_times(chunks, start_date, end_date, target_tz='UTC'):
+    """
+    Variante en flux de parse_busy_times : lit le calendrier par morceaux et n'extrait
+    que les lignes DTSTART/DTEND de chaque VEVENT, sans construire l'arbre icalendar.
 
-    # print(f"Périodes occupées fusionnées (UTC): {merged_busy_periods}") # Debug
-    return merged_busy_periods
+    Les événements dont les dates sont clairement hors de la fenêtre demandée sont écartés
+    avant toute conversion en datetime. Les blocs VTIMEZONE sont transmis à icalendar afin
+    que les TZID personnalisés soient résolus comme par le parseur complet.
 
+    Args:
+        chunks (iterable): Morceaux bytes successifs du fichier .ics.
+        start_date (datetime.date): Date de début de la période.
+        end_date (datetime.date): Date de fin de la période.
+        target_tz (str): Fuseau horaire cible pour normaliser les heures (ex: 'Europe/Paris').
 
-def create_ical_feed(scheduled_events, target_tz='UTC'):
+    Returns:
+        list: Une liste de tuples [(start_datetime_utc, end_datetime_utc), ...] en UTC.
     """
-    Crée une chaîne de caractères au format iCalendar (.ics) à partir d'une liste d'événements planifiés.
+    busy_periods_utc = []
+    offset_table = _window_offset_table(start_date, end_date, pytz.timezone(target_tz))
+    start_dt_utc, end_dt_utc = _busy_window_utc(start_date, end_date, offset_table)
+    # Marge de deux jours autour de la fenêtre pour absorber tout décalage horaire
+    window_low = (start_date - timedelta(days=2)).strftime('%Y%m%d').encode('ascii')
+    window_high = (end_date + timedelta(days=2)).strftime('%Y%m%d').encode('ascii')
+
+    stack = [] # Noms des composants ouverts
+    vevent_count = 0
+    dtstart_line = dtend_line = None
+    timezone_lines = None # Lignes du bloc VTIMEZONE en cours de lecture
+
+    for line in _iter_content_lines(chunks):
+        if timezone_lines is not None:
+            timezone_lines.append(line)
+            if line.upper().startswith(b'END:VTIMEZONE'):
+                # Enregistre le fuseau auprès d'icalendar (comme Calendar.from_ical)
+                Calendar.from_ical(b'\r\n'.join(timezone_lines))
+                timezone_lines = None
+            continue
+
+        upper = line[:8].upper()
+        if upper.startswith(b'BEGIN:'):
+            component = line[6:].strip().upper()
+            if component == b'VTIMEZONE':
+                timezone_lines = [line]
+                continue
+            stack.append(component)
+            if component == b'VEVENT':
+                vevent_count += 1
+                dtstart_line = dtend_line = None
+        elif upper.startswith(b'END:'):
+            component = stack.pop() if stack else None
+            if component != b'VEVENT' or not dtstart_line or not dtend_line:
+                continue # Événement incomplet ou autre composant
+
+            start_value = dtstart_line[dtstart_line.rfind(b':') + 1:]
+            end_value = dtend_line[dtend_line.rfind(b':') + 1:]
+            if end_value[:8] < window_low or start_value[:8] > window_high:
+                continue # Hors fenêtre : inutile de construire les datetimes
+
+            try:
+                start_time, end_time = _scanned_value(dtstart_line), _scanned_value(dtend_line)
+            except ValueError:
+                continue # Valeur invalide : ignorée, comme le fait icalendar pour un VEVENT
+            period = _event_period_utc(start_time, end_time, offset_table, start_dt_utc, end_dt_utc)
+            if period is not None:
+                busy_periods_utc.append(period)
+        elif stack and stack[-1] == b'VEVENT':
+            if upper.startswith(b'DTSTART') and line[7:8] in (b':', b';'):
+                dtstart_line = line
+            elif upper.startswith(b'DTEND') and line[5:6] in (b':', b';'):
+                dtend_line = line
+
+    current_trace().count('vevents_scanned', vevent_count)
+    return _merge_busy_periods(busy_periods_utc)
+
+
+def fetch_all_busy_times(calendar_urls, start_date, end_date, target_tz='UTC', max_workers=4, deadline=None, cache_dir=None, parser='full'):
+    """
+    Télécharge et parse tous les calendriers sources en parallèle (pool de threads borné),
+    sous une échéance globale unique.
 
     Args:
-        scheduled_events (list): Liste de dictionnaires, chacun représentant un événement planifié.
-                                 Chaque dict doit avoir : 'name', 'category', 'start_utc', 'end_utc'.
-        target_tz (str): Le fuseau horaire dans lequel afficher les événements dans le calendrier client.
+        calendar_urls (list): Liste des URLs des fichiers .ics publics.
+        start_date (datetime.date): Date de début de la période.
+        end_date (datetime.date): Date de fin de la période.
+        target_tz (str): Fuseau horaire cible (ex: 'Europe/Paris').
+        max_workers (int): Nombre maximum de téléchargements simultanés.
+        deadline (float): Échéance globale en secondes (None = pas d'échéance).
+        cache_dir (str): Dossier du cache HTTP conditionnel (None pour désactiver le cache).
+        parser (str): 'full' ou 'stream' (voir get_busy_times).
 
     Returns:
-        bytes: Le contenu du fichier iCalendar encodé en UTF-8.
+        list: Une liste de dictionnaires, dans le même ordre que calendar_urls :
+              {'url', 'busy_times', 'duration', 'status'} où status vaut 'ok', 'error' ou 'timeout'.
+              Une source hors délai est traitée comme n'ayant aucune période occupée.
     """
-    cal = Calendar()
-    cal.add('prodid', '-//Mon Planificateur Personnel//mxm.dk//')
-    cal.add('version', '2.0')
-    cal.add('calscale', 'GREGORIAN')
-    cal.add('method', 'PUBLISH') # Indique que c'est un calendrier publié
+    if not calendar_urls:
+        return []
+
+    def _fetch_one(calendar_url):
+        started = time_module.perf_counter()
+        busy_times = get_busy_times(calendar_url, start_date, end_date, target_tz=target_tz, cache_dir=cache_dir, parser=parser)
+        return busy_times, time_module.perf_counter() - started
 
+    started = time_module.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(calendar_urls))))
+    try:
+        # Chaque téléchargement s'exécute dans une copie du contexte courant (trace de la requête)
+        futures = [executor.submit(copy_context().run, _fetch_one, calendar_url) for calendar_url in calendar_urls]
+        wait(futures, timeout=deadline)
+    finally:
+        # Ne pas attendre les sources hors délai : elles finiront en arrière-plan
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    results = []
+    for calendar_url, future in zip(calendar_urls, futures):
+        if future.done() and not future.cancelled():
+            try:
+                busy_times, duration = future.result()
+            except Exception as e:
+                print(f"Erreur inattendue pour le calendrier {calendar_url[:50]}...: {e}")
+                results.append({'url': calendar_url, 'busy_times': [], 'duration': time_module.perf_counter() - started, 'status': 'error'})
+                continue
+            results.append({'url': calendar_url, 'busy_times': busy_times, 'duration': duration, 'status': 'ok'})
+        else:
+            results.append({'url': calendar_url, 'busy_times': [], 'duration': time_module.perf_counter() - started, 'status': 'timeout'})
+    return results
+
+
+# --- Sérialisation iCalendar (RFC 5545) ---
+# Écriture directe des lignes de contenu, octet pour octet identique à ce que produisait
+# icalendar (Calendar / Event / to_ical) pour ces propriétés : même ordre, même échappement
+# des textes et même pliage des lignes.
+FEED_PRODID = '-//Mon Planificateur Personnel//mxm.dk//'
+_QUOTABLE_PARAM = re.compile("[,;: ’']")
+
+
+def _escape_text(text):
+    """Échappement des valeurs TEXT (RFC 5545, 3.3.11), dans le même ordre qu'icalendar."""
+    return text.replace('\\N', '\n')\
+               .replace('\\', '\\\\')\
+               .replace(';', '\\;')\
+               .replace(',', '\\,')\
+               .replace('\r\n', '\\n')\
+               .replace('\n', '\\n')
+
+
+def _fold_line(line, limit=75):
+    """Plie une ligne de contenu à 75 octets (CRLF suivi d'un espace), comme icalendar."""
+    if line.isascii():
+        if len(line) < limit:
+            return line
+        return '\r\n '.join(line[i:i + limit - 1] for i in range(0, len(line), limit - 1))
+    folded = []
+    byte_count = 0
+    for char in line:
+        char_byte_len = len(char.encode('utf-8'))
+        byte_count += char_byte_len
+        if byte_count >= limit:
+            folded.append('\r\n ')
+            byte_count = char_byte_len
+        folded.append(char)
+    return ''.join(folded)
+
+
+def _param_value(value):
+    """Valeur de paramètre, entre guillemets si elle contient un caractère réservé."""
+    value = value.replace('"', "'")
+    return f'"{value}"' if _QUOTABLE_PARAM.search(value) else value
+
+
+def _format_datetime(dt):
+    """Date-heure au format iCalendar (AAAAMMJJTHHMMSS)."""
+    return f"{dt.year:04}{dt.month:02}{dt.day:02}T{dt.hour:02}{dt.minute:02}{dt.second:02}"
+
+
+@lru_cache(maxsize=16)
+def _vtimezone_lines(timezone_name, first_year, last_year):
+    """Lignes (déjà pliées) du composant VTIMEZONE d'un fuseau, couvrant les années données."""
+    component = Timezone.from_tzinfo(
+        pytz.timezone(timezone_name), first_date=date(first_year, 1, 1), last_date=date(last_year + 1, 1, 1)
+    )
+    return tuple(component.to_ical().decode('utf-8').split('\r\n')[:-1])
+
+
+def _iter_ical_lines(scheduled_events, target_tz='UTC', include_vtimezone=False):
+    """Produit les lignes de contenu (pliées, sans CRLF final) du flux iCalendar."""
     timezone = pytz.timezone(target_tz)
+    # Identifiant du fuseau tel qu'icalendar l'écrit : suffixe Z pour UTC (et ses équivalents),
+    # paramètre TZID sinon. Calculé une fois pour tout le flux.
+    tzid = tzid_from_tzinfo(timezone)
+    if tzid == 'UTC':
+        time_prefix, time_suffix = ':', 'Z'
+    elif tzid:
+        time_prefix, time_suffix = f";TZID={_param_value(tzid)}:", ''
+    else:
+        time_prefix, time_suffix = ':', ''
+    # Heure de génération du flux : une seule valeur pour tous les événements
+    dtstamp = _format_datetime(datetime.now(pytz.utc)) + 'Z'
+
+    yield 'BEGIN:VCALENDAR'
+    yield 'VERSION:2.0'
+    yield _fold_line(f"PRODID:{_escape_text(FEED_PRODID)}")
+    yield 'CALSCALE:GREGORIAN'
+    yield 'METHOD:PUBLISH' # Indique que c'est un calendrier publié
+
+    if include_vtimezone and tzid and tzid != 'UTC' and scheduled_events:
+        # Un seul VTIMEZONE pour tous les événements, pour les clients qui ne connaissent pas le TZID
+        years = [event_data['start_utc'].year for event_data in scheduled_events]
+        yield from _vtimezone_lines(target_tz, min(years) - 1, max(years) + 1)
 
     for event_data in scheduled_events:
-        event = Event()
-        event.add('summary', event_data['name'])
-
-        # Convertir les datetimes UTC en datetime locaux pour l'affichage
+        name = event_data['name']
         start_utc = event_data['start_utc']
-        end_utc = event_data['end_utc']
+        # Convertir les datetimes UTC en datetime locaux pour l'affichage
         start_local = start_utc.astimezone(timezone)
-        end_local = end_utc.astimezone(timezone)
-
-        event.add('dtstart', start_local)
-        event.add('dtend', end_local)
-        event.add('dtstamp', datetime.now(pytz.utc)) # Heure de création de l'événement
-        event.add('uid', f"{start_utc.strftime('%Y%m%dT%H%M%SZ')}-{event_data['name']}@monplanificateur.perso") # ID unique
+        end_local = event_data['end_utc'].astimezone(timezone)
+
+        yield 'BEGIN:VEVENT'
+        yield _fold_line(f"SUMMARY:{_escape_text(name)}")
+        yield f"DTSTART{time_prefix}{_format_datetime(start_local)}{time_suffix}"
+        yield f"DTEND{time_prefix}{_format_datetime(end_local)}{time_suffix}"
+        yield f"DTSTAMP:{dtstamp}" # Heure de génération du flux
+        uid = f"{_format_datetime(start_utc)}Z-{name}@monplanificateur.perso" # ID unique
+        yield _fold_line(f"UID:{_escape_text(uid)}")
         if 'category' in event_data:
-            event.add('categories', [event_data['category']])
-        # event.add('description', f"Planifié automatiquement. Catégorie: {event_data.get('category', 'N/A')}")
+            yield _fold_line(f"CATEGORIES:{_escape_text(event_data['category'])}")
+        yield 'END:VEVENT'
+
+    yield 'END:VCALENDAR'
+
+
+def _iter_ical_chunks(scheduled_events, target_tz='UTC', include_vtimezone=False):
+    """Produit le flux par morceaux encodés : en-tête (et VTIMEZONE), un VEVENT à la fois, puis la fin."""
+    chunk = []
+    for line in _iter_ical_lines(scheduled_events, target_tz, include_vtimezone):
+        if (line == 'BEGIN:VEVENT' or line == 'END:VCALENDAR') and chunk:
+            yield ('\r\n'.join(chunk) + '\r\n').encode('utf-8')
+            chunk = []
+        chunk.append(line)
+    yield ('\r\n'.join(chunk) + '\r\n').encode('utf-8')
+
+
+def create_ical_feed(scheduled_events, target_tz='UTC', include_vtimezone=False, stream=False):
+    """
+    Crée une chaîne de caractères au format iCalendar (.ics) à partir d'une liste d'événements planifiés.
+
+    Les lignes sont écrites directement (sans objets icalendar par événement) ; la sortie est
+    identique, octet pour octet, à celle de icalendar pour les mêmes événements, à DTSTAMP près
+    (désormais calculé une seule fois pour tout le flux).
 
-        cal.add_component(event)
+    Args:
+        scheduled_events (list): Liste de dictionnaires, chacun représentant un événement planifié.
+                                 Chaque dict doit avoir : 'name', 'category', 'start_utc', 'end_utc'.
+        target_tz (str): Le fuseau horaire dans lequel afficher les événements dans le calendrier client.
+        include_vtimezone (bool): Ajouter une définition VTIMEZONE du fuseau (une seule fois),
+                                  pour les clients qui ne résolvent pas les TZID eux-mêmes.
+        stream (bool): Retourner un générateur de morceaux (bytes) au lieu du contenu complet :
+                       en-tête, puis un VEVENT par morceau, puis la fin du calendrier. Leur
+                       concaténation est identique au contenu complet.
 
-    return cal.to_ical() # Retourne des bytes (UTF-8 par défaut)
+    Returns:
+        bytes | generator: Le contenu du fichier iCalendar encodé en UTF-8
+                           (ou ses morceaux successifs si stream=True).
+    """
+    if stream:
+        return _iter_ical_chunks(scheduled_events, target_tz, include_vtimezone)
+    content = '\r\n'.join(_iter_ical_lines(scheduled_events, target_tz, include_vtimezone)) + '\r\n'
+    return content.encode('utf-8') # Retourne des bytes (UTF-8)
 
 # --- Fin de calendar_utils.py ---
\ No newline at end of file
@@ -34,5 +34,86 @@ class Config:
     print(f"Debug [config.py]: Config.PERSONAL_CALENDAR_URLS set to = {PERSONAL_CALENDAR_URLS}")
     # --- Fin de l'ajout ---
 
+    # Récupération concurrente des calendriers sources
+    CALENDAR_FETCH_MAX_WORKERS = int(os.environ.get('CALENDAR_FETCH_MAX_WORKERS', 4))
+    # Échéance globale (en secondes) pour l'ensemble des téléchargements
+    CALENDAR_FETCH_DEADLINE = float(os.environ.get('CALENDAR_FETCH_DEADLINE', 15))
+
+    # Session HTTP partagée pour les téléchargements (pools keep-alive par hôte)
+    HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 10))
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 10))
+    HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', 0))
+
+    # Cache disque des calendriers sources (requêtes conditionnelles ETag / Last-Modified)
+    # Mettre CALENDAR_CACHE_DIR à une chaîne vide pour désactiver le cache
+    CALENDAR_CACHE_DIR = os.environ.get('CALENDAR_CACHE_DIR', os.path.join(basedir, 'instance', 'calendar_cache'))
+
+    # Cache des périodes occupées parsées, indexé par l'empreinte du contenu source
+    PARSE_CACHE_SIZE = int(os.environ.get('PARSE_CACHE_SIZE', 64)) # 0 pour désactiver
+    # Niveau disque optionnel (chaîne vide pour le désactiver)
+    PARSE_CACHE_DIR = os.environ.get('PARSE_CACHE_DIR', os.path.join(basedir, 'instance', 'parse_cache'))
+    # Nombre maximum de fichiers du niveau disque (les moins récemment utilisés sont supprimés)
+    PARSE_CACHE_DISK_ENTRIES = int(os.environ.get('PARSE_CACHE_DISK_ENTRIES', 256))
+
+    # Parseur des calendriers sources : 'full' (arbre icalendar complet) ou 'stream'
+    # (scanner VEVENT par morceaux, plus économe pour les gros calendriers)
+    CALENDAR_PARSER = os.environ.get('CALENDAR_PARSER', 'stream')
+
+    # Rafraîchissement en arrière-plan des périodes occupées (stale-while-revalidate)
+    BACKGROUND_REFRESH_ENABLED = os.environ.get('BACKGROUND_REFRESH_ENABLED', '1').lower() not in ('0', 'false', 'no')
+    # Âge maximum (en secondes) d'un instantané avant rafraîchissement
+    CALENDAR_REFRESH_INTERVAL = float(os.environ.get('CALENDAR_REFRESH_INTERVAL', 300))
+    # Intervalle propre à chaque source (PERSONAL_CALENDAR_REFRESH_INTERVAL_1, _2, _3), optionnel
+    CALENDAR_REFRESH_INTERVALS = {
+        os.environ[f'PERSONAL_CALENDAR_URL_{i}']: float(os.environ[f'PERSONAL_CALENDAR_REFRESH_INTERVAL_{i}'])
+        for i in (1, 2, 3)
+        if os.environ.get(f'PERSONAL_CALENDAR_URL_{i}') and os.environ.get(f'PERSONAL_CALENDAR_REFRESH_INTERVAL_{i}')
+    }
+
+    # Moteur vectorisé (NumPy, optionnel) pour la grille de créneaux du planificateur
+    SCHEDULER_VECTORIZED = os.environ.get('SCHEDULER_VECTORIZED', '0').lower() in ('1', 'true', 'yes')
+    # Moteur de placement du planificateur : 'greedy' (round-robin) ou 'flow' (flot à coût minimum).
+    # 'flow' planifie autant de temps que 'greedy' avec moins de relaxations de catégorie, mais moins
+    # de temps que lui avec SCHEDULER_CONTIGUOUS_BLOCKS (voir benchmarks/bench_engines.py)
+    SCHEDULER_ENGINE = os.environ.get('SCHEDULER_ENGINE', 'greedy')
+    # Recherche locale après placement : budget en millisecondes (0 pour désactiver) et graine
+    SCHEDULER_IMPROVE_BUDGET_MS = float(os.environ.get('SCHEDULER_IMPROVE_BUDGET_MS', 0))
+    SCHEDULER_IMPROVE_SEED = int(os.environ.get('SCHEDULER_IMPROVE_SEED', 0))
+    # Réparation incrémentale du planning précédent (même semaine) au lieu d'un recalcul complet
+    # (le cache des plannings, SCHEDULE_CACHE_SIZE, n'est alors pas utilisé)
+    SCHEDULER_INCREMENTAL = os.environ.get('SCHEDULER_INCREMENTAL', '0').lower() in ('1', 'true', 'yes')
+    # Blocs de créneaux contigus d'une même activité (jusqu'à 2 h, sans espacement minimum entre eux) :
+    # désactivé, chaque créneau est séparé du suivant ; avec FEED_COALESCE_EVENTS, un VEVENT par bloc
+    SCHEDULER_CONTIGUOUS_BLOCKS = os.environ.get('SCHEDULER_CONTIGUOUS_BLOCKS', '0').lower() in ('1', 'true', 'yes')
+
+    # Cache des plannings générés, indexé par l'empreinte des entrées (0 pour désactiver)
+    SCHEDULE_CACHE_SIZE = int(os.environ.get('SCHEDULE_CACHE_SIZE', 64))
+    # Niveau persistant du cache des plannings dans la base SQLite (table schedule_cache_entry)
+    SCHEDULE_CACHE_PERSISTENT = os.environ.get('SCHEDULE_CACHE_PERSISTENT', '0').lower() in ('1', 'true', 'yes')
+    SCHEDULE_CACHE_DB_MAX_ENTRIES = int(os.environ.get('SCHEDULE_CACHE_DB_MAX_ENTRIES', 256))
+
+    # En-tête Cache-Control du flux iCalendar ('no-cache' : le client revalide avec l'ETag à chaque requête)
+    FEED_CACHE_CONTROL = os.environ.get('FEED_CACHE_CONTROL', 'no-cache')
+    # Flux pré-généré (flask nexday build-feed) servi tel quel par la route du flux
+    FEED_STATIC_ENABLED = os.environ.get('FEED_STATIC_ENABLED', '0').lower() in ('1', 'true', 'yes')
+    FEED_STATIC_PATH = os.environ.get('FEED_STATIC_PATH', os.path.join(basedir, 'instance', 'feed.ics'))
+    # Intervalle (en secondes) de régénération en arrière-plan du flux pré-généré (0 pour désactiver)
+    FEED_STATIC_REFRESH_INTERVAL = float(os.environ.get('FEED_STATIC_REFRESH_INTERVAL', 0))
+    # Ajouter au flux une définition VTIMEZONE du fuseau local (désactivé : flux inchangé)
+    FEED_INCLUDE_VTIMEZONE = os.environ.get('FEED_INCLUDE_VTIMEZONE', '0').lower() in ('1', 'true', 'yes')
+    # Envoyer le flux généré à la demande par morceaux (transfert chunked, un VEVENT à la fois)
+    FEED_STREAMING = os.environ.get('FEED_STREAMING', '1').lower() in ('1', 'true', 'yes')
+    # Fusionner les créneaux consécutifs d'une même activité en un seul VEVENT (blocs : SCHEDULER_CONTIGUOUS_BLOCKS)
+    FEED_COALESCE_EVENTS = os.environ.get('FEED_COALESCE_EVENTS', '0').lower() in ('1', 'true', 'yes')
+    # Mesure par phase de la génération du flux : en-tête Server-Timing et ligne de log « Trace: {...} »
+    FEED_TRACING = os.environ.get('FEED_TRACING', '0').lower() in ('1', 'true', 'yes')
+    # Nombre de semaines du flux (paramètre ?weeks=N de la route, borné par FEED_MAX_WEEKS)
+    FEED_WEEKS = int(os.environ.get('FEED_WEEKS', 1))
+    FEED_MAX_WEEKS = int(os.environ.get('FEED_MAX_WEEKS', 52))
+    # Regrouper les générations simultanées identiques du flux (une seule récupération + planification)
+    FEED_SINGLE_FLIGHT = os.environ.get('FEED_SINGLE_FLIGHT', '1').lower() in ('1', 'true', 'yes')
+    # Répertoire des verrous de fichiers qui étendent ce regroupement aux processus workers ('' : threads seulement)
+    FEED_SINGLE_FLIGHT_DIR = os.environ.get('FEED_SINGLE_FLIGHT_DIR', os.path.join(basedir, 'instance', 'singleflight'))
+
     # Conserver l'ancienne variable pour compatibilité si nécessaire, mais préférer la liste
     # APPLE_CALENDAR_URL = os.environ.get('PERSONAL_CALENDAR_URL_1') # Ou garder l'ancien nom si utilisé ailleurs
\ No newline at end of file
@@ -0,0 +1,91 @@
+import heapq
+
+class MinCostFlow:
+    """
+    Réseau de flot à coût minimum, résolu par plus courts chemins successifs
+    (Dijkstra avec potentiels de Johnson). Capacités et coûts entiers, coûts initiaux positifs ou nuls.
+
+    Chaque augmentation pousse autant de flot que le permet le chemin le moins coûteux :
+    le flot obtenu est maximal et, parmi les flots maximaux, de coût minimal.
+    """
+
+    def __init__(self, node_count):
+        """
+        Args:
+            node_count (int): Nombre de nœuds (numérotés de 0 à node_count - 1).
+        """
+        self.node_count = node_count
+        # Arcs du graphe résiduel : [destination, capacité restante, coût, index de l'arc inverse]
+        self._graph = [[] for _ in range(node_count)]
+
+    def add_edge(self, source, target, capacity, cost=0):
+        """
+        Ajoute un arc et son arc inverse résiduel.
+
+        Returns:
+            tuple: Référence de l'arc, à passer à flow_on() après résolution.
+        """
+        self._graph[source].append([target, capacity, cost, len(self._graph[target])])
+        self._graph[target].append([source, 0, -cost, len(self._graph[source]) - 1])
+        return source, len(self._graph[source]) - 1, capacity
+
+    def flow_on(self, edge):
+        """Flot passant par un arc retourné par add_edge."""
+        source, index, capacity = edge
+        return capacity - self._graph[source][index][1]
+
+    def solve(self, source, sink):
+        """
+        Calcule un flot maximal de coût minimal de source à sink.
+
+        Returns:
+            tuple: (valeur du flot, coût total).
+        """
+        graph = self._graph
+        potentials = [0] * self.node_count
+        total_flow = total_cost = 0
+        while True:
+            # Dijkstra sur les coûts réduits (positifs grâce aux potentiels)
+            distances = [None] * self.node_count
+            previous = [None] * self.node_count # (nœud précédent, index de l'arc)
+            distances[source] = 0
+            heap = [(0, source)]
+            while heap:
+                distance, node = heapq.heappop(heap)
+                if distance > distances[node]:
+                    continue
+                for index, (target, capacity, cost, _) in enumerate(graph[node]):
+                    if capacity <= 0:
+                        continue
+                    candidate = distance + cost + potentials[node] - potentials[target]
+                    if distances[target] is None or candidate < distances[target]:
+                        distances[target] = candidate
+                        previous[target] = (node, index)
+                        heapq.heappush(heap, (candidate, target))
+            if distances[sink] is None:
+                break # Plus de chemin augmentant
+
+            for node in range(self.node_count):
+                if distances[node] is not None:
+                    potentials[node] += distances[node]
+
+            # Capacité résiduelle minimale le long du chemin, puis augmentation
+            pushed = None
+            node = sink
+            while node != source:
+                parent, index = previous[node]
+                capacity = graph[parent][index][1]
+                pushed = capacity if pushed is None else min(pushed, capacity)
+                node = parent
+            node = sink
+            while node != source:
+                parent, index = previous[node]
+                edge = graph[parent][index]
+                edge[1] -= pushed
+                graph[node][edge[3]][1] += pushed
+                total_cost += pushed * edge[2]
+                node = parent
+            total_flow += pushed
+        return total_flow, total_cost
+
+# --- Fin de flow_utils.py ---
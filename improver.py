@@ -0,0 +1,321 @@
+import math
+import random
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+# --- Poids de la fonction de coût (à minimiser) ---
+UNSCHEDULED_SLOT_COST = 1000 # Par créneau manquant à une activité
+RELAXATION_COST = 100 # Par créneau au-delà d'un par catégorie et par jour
+BLOCK_COST = 1 # Par bloc (suite de créneaux contigus d'une même activité) : pénalise la fragmentation
+
+# --- Recuit simulé ---
+INITIAL_TEMPERATURE = 50.0
+FINAL_TEMPERATURE = 0.5
+# Nombre d'itérations par milliseconde de budget : estimation prudente (environ deux fois moins
+# que la vitesse mesurée sur une semaine chargée), pour que le nombre d'itérations, et non
+# l'horloge, arrête la recherche et que le résultat ne dépende que du budget et de la graine
+ITERATIONS_PER_MS = 25
+MAX_ITERATIONS = 40000 # Plafond du nombre d'itérations, quel que soit le budget
+CLOCK_CHECK_EVERY = 64 # Lecture de l'horloge toutes les N itérations
+
+_FREE = -1
+
+
+class _ScheduleState:
+    """
+    Affectation des créneaux disponibles aux activités, avec les compteurs nécessaires
+    au calcul incrémental du coût : besoins restants, créneaux par (jour, catégorie),
+    positions occupées triées (pour l'espacement minimum).
+    """
+
+    def __init__(self, activity_needs, slot_minutes, slot_days, slot_duration_minutes, min_gap_minutes, max_continuous_minutes,
+                 contiguous_blocks=False):
+        self.needs = activity_needs
+        self.categories = [need['activity'].category for need in activity_needs]
+        self.slot_minutes = slot_minutes
+        self.slot_days = slot_days
+        self.slot_duration_minutes = slot_duration_minutes
+        self.min_gap_minutes = min_gap_minutes
+        self.max_continuous_minutes = max_continuous_minutes
+        self.contiguous_blocks = contiguous_blocks
+        self.assigned = array('l', [_FREE]) * len(slot_minutes) # Index du besoin par créneau
+        self.remaining = [need['slots_remaining'] for need in activity_needs]
+        self.day_category_counts = defaultdict(int) # {(jour, catégorie): créneaux}
+        self.occupied = [] # Positions occupées, triées
+        self.cost = UNSCHEDULED_SLOT_COST * sum(self.remaining)
+
+    def _is_contiguous(self, left, right):
+        """Les créneaux aux positions left et right = left + 1 se suivent-ils sans interruption ?"""
+        return 0 <= left and right < len(self.slot_minutes) and \
+            self.slot_minutes[left] + self.slot_duration_minutes == self.slot_minutes[right]
+
+    def _continues_block(self, left, right):
+        """Les créneaux left et right = left + 1 forment-ils un même bloc (contigus, même activité) ?"""
+        return self._is_contiguous(left, right) and self.assigned[left] == self.assigned[right]
+
+    def _adjacencies(self, position):
+        """Nombre de liaisons contiguës « même activité » entre position et ses voisins."""
+        need_index = self.assigned[position]
+        if need_index == _FREE:
+            return 0
+        count = 0
+        for left, right in ((position - 1, position), (position, position + 1)):
+            if self._continues_block(left, right):
+                count += 1
+        return count
+
+    def set(self, position, need_index):
+        """Affecte (ou libère, avec _FREE) un créneau et met à jour le coût. Retourne l'ancienne valeur."""
+        previous = self.assigned[position]
+        if previous == need_index:
+            return previous
+        day = self.slot_days[position]
+        # Les blocs = créneaux occupés - liaisons contiguës : retirer l'ancienne contribution
+        self.cost -= BLOCK_COST * ((previous != _FREE) - self._adjacencies(position))
+        if previous != _FREE:
+            key = (day, self.categories[previous])
+            self.cost -= RELAXATION_COST * (self.day_category_counts[key] > 1)
+            self.day_category_counts[key] -= 1
+            self.remaining[previous] += 1
+            self.cost += UNSCHEDULED_SLOT_COST
+            self.occupied.pop(bisect_left(self.occupied, position))
+        self.assigned[position] = need_index
+        if need_index != _FREE:
+            key = (day, self.categories[need_index])
+            self.day_category_counts[key] += 1
+            self.cost += RELAXATION_COST * (self.day_category_counts[key] > 1)
+            self.remaining[need_index] -= 1
+            self.cost -= UNSCHEDULED_SLOT_COST
+            insort(self.occupied, position)
+        self.cost += BLOCK_COST * ((need_index != _FREE) - self._adjacencies(position))
+        return previous
+
+    def is_feasible(self, position):
+        """
+        Vérifie l'espacement minimum et la durée continue maximale autour d'un créneau occupé.
+        Avec contiguous_blocks, deux créneaux contigus d'une même activité forment un bloc :
+        pas d'espacement entre eux.
+        """
+        need_index = self.assigned[position]
+        if need_index == _FREE:
+            if not self.contiguous_blocks:
+                return True
+            # Libérer un créneau au milieu d'un bloc en laisse deux parties trop proches
+            rank = bisect_left(self.occupied, position)
+            if 0 < rank < len(self.occupied):
+                previous, following = self.occupied[rank - 1], self.occupied[rank]
+                return self.slot_minutes[following] >= self.slot_minutes[previous] + self.slot_duration_minutes + self.min_gap_minutes
+            return True
+        if self.remaining[need_index] < 0:
+            return False
+        start = self.slot_minutes[position]
+        end = start + self.slot_duration_minutes
+        rank = bisect_left(self.occupied, position)
+        if rank > 0:
+            previous = self.occupied[rank - 1]
+            if start < self.slot_minutes[previous] + self.slot_duration_minutes + self.min_gap_minutes and \
+                    not (self.contiguous_blocks and previous == position - 1 and self._continues_block(previous, position)):
+                return False
+        if rank + 1 < len(self.occupied):
+            following = self.occupied[rank + 1]
+            if self.slot_minutes[following] < end + self.min_gap_minutes and \
+                    not (self.contiguous_blocks and following == position + 1 and self._continues_block(position, following)):
+                return False
+        # Durée continue du bloc contenant ce créneau
+        continuous = self.slot_duration_minutes
+        left = position
+        while self._continues_block(left - 1, left):
+            left -= 1
+            continuous += self.slot_duration_minutes
+        right = position
+        while self._continues_block(right, right + 1):
+            right += 1
+            continuous += self.slot_duration_minutes
+        return continuous <= self.max_continuous_minutes
+
+
+def improve_schedule(activity_needs, slot_minutes, slot_days, slot_duration_minutes, scheduled_activities, scheduled_minutes,
+                     min_gap_minutes, max_continuous_minutes, budget_ms=50, seed=0, max_iterations=None,
+                     contiguous_blocks=False):
+    """
+    Améliore un planning par recherche locale (recuit simulé) dans un budget de temps strict.
+
+    Mouvements : ajouter une activité non terminée dans un créneau libre, déplacer un créneau
+    planifié vers un créneau libre, changer l'activité d'un créneau, échanger les activités
+    de deux créneaux. Le coût pénalise les minutes non planifiées, puis les relaxations de
+    catégorie, puis la fragmentation ; l'espacement minimum et la durée continue maximale
+    sont toujours respectés. La meilleure solution rencontrée est retournée.
+
+    La recherche s'arrête normalement après un nombre d'itérations déduit du budget
+    (ITERATIONS_PER_MS, au plus MAX_ITERATIONS) : la suite des mouvements ne dépendant que
+    de seed, le résultat ne dépend que du budget et de la graine, comme le supposent
+    schedule_digest et les caches. L'horloge n'est qu'une limite de sécurité : si le budget
+    expire avant (machine très lente ou surchargée), le meilleur planning trouvé est retourné
+    avec un avertissement, et il n'est alors plus reproductible.
+
+    Args:
+        activity_needs (list): Besoins {'activity', 'slots_remaining'} après placement (mis à jour).
+        slot_minutes (array): Début des créneaux disponibles, en minutes depuis le début de semaine.
+        slot_days (array): Jour local (depuis le 1970-01-01) de chaque créneau.
+        slot_duration_minutes (int): Durée de chaque créneau.
+        scheduled_activities (list): Activités du planning initial.
+        scheduled_minutes (array): Débuts (en minutes) des créneaux du planning initial.
+        min_gap_minutes (int): Espacement minimum entre deux événements (entre deux blocs avec contiguous_blocks).
+        max_continuous_minutes (int): Durée maximale d'un bloc d'une même activité.
+        budget_ms (float): Budget de temps en millisecondes.
+        seed (int): Graine du générateur pseudo-aléatoire.
+        max_iterations (int): Nombre d'itérations (None : déduit de budget_ms).
+        contiguous_blocks (bool): Autoriser les blocs contigus d'une même activité sans espacement.
+
+    Returns:
+        tuple: (activités planifiées, débuts en minutes), dans l'ordre chronologique.
+    """
+    deadline = time.perf_counter() + budget_ms / 1000
+    # Besoins initiaux (avant placement) : le planning initial est rejoué dans l'état
+    needs = [{'activity': need['activity'], 'slots_remaining': need['slots_remaining']} for need in activity_needs]
+    need_indices = {id(need['activity']): need_index for need_index, need in enumerate(needs)}
+    for activity in scheduled_activities:
+        needs[need_indices[id(activity)]]['slots_remaining'] += 1
+    state = _ScheduleState(needs, slot_minutes, slot_days, slot_duration_minutes, min_gap_minutes, max_continuous_minutes,
+                           contiguous_blocks)
+    positions = {minute: position for position, minute in enumerate(slot_minutes)}
+    for activity, minute in zip(scheduled_activities, scheduled_minutes):
+        state.set(positions[minute], need_indices[id(activity)])
+
+    best_cost = state.cost
+    best_assigned = array('l', state.assigned)
+    rng = random.Random(seed)
+    slot_count = len(slot_minutes)
+    if max_iterations is None:
+        max_iterations = min(MAX_ITERATIONS, int(budget_ms * ITERATIONS_PER_MS))
+    # La température atteint sa valeur finale à mi-parcours
+    cooling = (FINAL_TEMPERATURE / INITIAL_TEMPERATURE) ** (1 / max(1, max_iterations // 2))
+    temperature = INITIAL_TEMPERATURE
+    iteration = 0
+    while slot_count and needs and iteration < max_iterations:
+        if iteration % CLOCK_CHECK_EVERY == 0 and time.perf_counter() >= deadline:
+            print(f"Avertissement: Budget de la recherche locale ({budget_ms} ms) épuisé après "
+                  f"{iteration}/{max_iterations} itérations, planning non reproductible.")
+            break
+        iteration += 1
+        temperature = max(FINAL_TEMPERATURE, temperature * cooling)
+
+        # Tirer un mouvement : liste de (position, nouvel index de besoin)
+        move_kind = rng.random()
+        position = rng.randrange(slot_count)
+        need_index = rng.randrange(len(needs))
+        if move_kind < 0.4:
+            # Déplacer / ajouter : le créneau choisi reçoit une activité, un créneau planifié est éventuellement libéré
+            if state.assigned[position] != _FREE:
+                continue
+            if state.remaining[need_index] > 0 or not state.occupied:
+                changes = [(position, need_index)]
+            else:
+                source = state.occupied[rng.randrange(len(state.occupied))]
+                changes = [(source, _FREE), (position, state.assigned[source])]
+        elif move_kind < 0.7:
+            # Changer l'activité d'un créneau planifié
+            if not state.occupied:
+                continue
+            position = state.occupied[rng.randrange(len(state.occupied))]
+            changes = [(position, need_index)]
+        else:
+            # Échanger les activités de deux créneaux planifiés
+            if len(state.occupied) < 2:
+                continue
+            position = state.occupied[rng.randrange(len(state.occupied))]
+            other = state.occupied[rng.randrange(len(state.occupied))]
+            if state.assigned[position] == state.assigned[other]:
+                continue
+            changes = [(position, state.assigned[other]), (other, state.assigned[position])]
+
+        previous_cost = state.cost
+        undo = [(changed_position, state.set(changed_position, new_need_index)) for changed_position, new_need_index in changes]
+        delta = state.cost - previous_cost
+        feasible = all(state.is_feasible(changed_position) for changed_position, _ in changes)
+        if feasible and (delta <= 0 or rng.random() < math.exp(-delta / temperature)):
+            if state.cost < best_cost:
+                best_cost = state.cost
+                best_assigned = array('l', state.assigned)
+            continue
+        for changed_position, old_need_index in reversed(undo):
+            state.set(changed_position, old_need_index)
+
+    # Reconstruire le meilleur planning et les besoins restants
+    for need in activity_needs:
+        need['slots_remaining'] = needs[need_indices[id(need['activity'])]]['slots_remaining']
+    improved_activities = []
+    improved_minutes = array('l')
+    for position, need_index in enumerate(best_assigned):
+        if need_index != _FREE:
+            improved_activities.append(needs[need_index]['activity'])
+            improved_minutes.append(slot_minutes[position])
+            activity_needs[need_index]['slots_remaining'] -= 1
+    return improved_activities, improved_minutes
+
+def repair_schedule(activity_needs, slot_minutes, slot_days, slot_duration_minutes, previous_assignments,
+                    min_gap_minutes, max_continuous_minutes, contiguous_blocks=False):
+    """
+    Répare un planning précédent après un changement d'activités (ajout, suppression,
+    modification de durée) en ne touchant que les créneaux concernés.
+
+    Les créneaux précédents sont conservés tant que leur activité existe encore, que le créneau
+    est toujours disponible et que le besoin de l'activité n'est pas dépassé (en cas de
+    réduction, les derniers créneaux de l'activité sont libérés). Les besoins restants sont
+    ensuite placés dans les créneaux libres, d'abord sans relaxer la contrainte de catégorie.
+
+    Args:
+        activity_needs (list): Besoins {'activity', 'slots_remaining'} (slots_remaining est décrémenté).
+        slot_minutes (array): Début des créneaux disponibles, en minutes depuis le début de semaine.
+        slot_days (array): Jour local (depuis le 1970-01-01) de chaque créneau.
+        slot_duration_minutes (int): Durée de chaque créneau.
+        previous_assignments (list): Planning précédent, en paires (activité, début en minutes),
+                                     les activités étant celles de activity_needs.
+        min_gap_minutes (int): Espacement minimum entre deux événements (entre deux blocs avec contiguous_blocks).
+        max_continuous_minutes (int): Durée maximale d'un bloc d'une même activité.
+        contiguous_blocks (bool): Autoriser les blocs contigus d'une même activité sans espacement.
+
+    Returns:
+        tuple: (activités planifiées, débuts en minutes), dans l'ordre chronologique.
+    """
+    state = _ScheduleState(activity_needs, slot_minutes, slot_days, slot_duration_minutes, min_gap_minutes, max_continuous_minutes,
+                           contiguous_blocks)
+    need_indices = {id(need['activity']): need_index for need_index, need in enumerate(activity_needs)}
+    positions = {minute: position for position, minute in enumerate(slot_minutes)}
+
+    # 1. Conserver les créneaux précédents encore valides (ordre chronologique)
+    for activity, minute in sorted(previous_assignments, key=lambda assignment: assignment[1]):
+        position = positions.get(minute)
+        need_index = need_indices.get(id(activity))
+        if position is None or need_index is None or state.assigned[position] != _FREE:
+            continue
+        state.set(position, need_index)
+        if not state.is_feasible(position):
+            state.set(position, _FREE)
+
+    # 2. Placer les besoins restants dans les créneaux libres : catégorie stricte, puis relaxée
+    for need_index, category in enumerate(state.categories):
+        for strict in (True, False):
+            for position in range(len(slot_minutes)):
+                if state.remaining[need_index] <= 0:
+                    break
+                if state.assigned[position] != _FREE:
+                    continue
+                if strict and state.day_category_counts[(slot_days[position], category)] > 0:
+                    continue
+                state.set(position, need_index)
+                if not state.is_feasible(position):
+                    state.set(position, _FREE)
+
+    repaired_activities = []
+    repaired_minutes = array('l')
+    for position in state.occupied:
+        repaired_activities.append(activity_needs[state.assigned[position]]['activity'])
+        repaired_minutes.append(slot_minutes[position])
+    for need_index, need in enumerate(activity_needs):
+        need['slots_remaining'] = state.remaining[need_index]
+    return repaired_activities, repaired_minutes
+
+# --- Fin de improver.py ---
@@ -0,0 +1,232 @@
+import heapq
+from bisect import bisect_left, bisect_right
+from array import array
+from datetime import datetime, timedelta
+import pytz # Pour les fuseaux horaires
+
+# Les bornes sont stockées en microsecondes depuis l'epoch (UTC) : la conversion depuis et
+# vers les datetimes est exacte, y compris pour les fins de journée en time.max.
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=pytz.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_epoch_us(value):
+    """Convertit un datetime avec fuseau horaire en microsecondes depuis l'epoch."""
+    return (value - _EPOCH_UTC) // _MICROSECOND
+
+
+def from_epoch_us(value):
+    """Convertit des microsecondes depuis l'epoch en datetime UTC (pytz.utc)."""
+    return _EPOCH_UTC + timedelta(microseconds=value)
+
+
+def _duration_us(value):
+    """Accepte une durée en timedelta ou en microsecondes (int)."""
+    if isinstance(value, timedelta):
+        return value // _MICROSECOND
+    return int(value)
+
+
+def merge_sorted(*sources):
+    """
+    Fusion k-voies paresseuse de séquences de paires (début, fin) déjà triées par début.
+
+    Un tas (heapq.merge) sélectionne la prochaine paire parmi les k sources, puis les
+    intervalles qui se chevauchent ou se touchent sont fusionnés au fil de l'eau :
+    le coût est O(n log k) et les intervalles fusionnés sont produits un par un.
+    Fonctionne aussi bien avec des entiers qu'avec des datetimes.
+
+    Yields:
+        tuple: Les intervalles (début, fin) fusionnés, triés, non vides.
+    """
+    pairs = sources[0] if len(sources) == 1 else heapq.merge(*sources)
+    current_start = current_end = None
+    for start, end in pairs:
+        if not start < end:
+            continue # Intervalle vide
+        if current_end is not None and start <= current_end: # Chevauchement ou adjacence
+            if end > current_end:
+                current_end = end
+        else:
+            if current_end is not None:
+                yield current_start, current_end
+            current_start, current_end = start, end
+    if current_end is not None:
+        yield current_start, current_end
+
+
+class IntervalSet:
+    """
+    Ensemble d'intervalles semi-ouverts [début, fin[ triés, disjoints et non adjacents,
+    stockés dans deux tableaux d'entiers parallèles (microsecondes depuis l'epoch UTC).
+
+    Les intervalles qui se chevauchent ou se touchent sont toujours fusionnés, comme le
+    faisaient les boucles « trier puis fusionner » de calendar_utils, scheduler et app.
+    Toutes les opérations retournent un nouvel ensemble.
+    """
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self, starts=(), ends=()):
+        """
+        Args:
+            starts (iterable): Débuts des intervalles, déjà triés et normalisés.
+            ends (iterable): Fins correspondantes.
+        Utiliser from_pairs / from_datetimes pour des données non normalisées.
+        """
+        self.starts = starts if isinstance(starts, array) else array('q', starts)
+        self.ends = ends if isinstance(ends, array) else array('q', ends)
+
+    # --- Construction et conversion ---
+
+    @classmethod
+    def from_sorted_pairs(cls, pairs):
+        """Construit l'ensemble à partir de paires (début, fin) d'entiers déjà triées par début."""
+        starts = array('q')
+        ends = array('q')
+        for start, end in merge_sorted(pairs):
+            starts.append(start)
+            ends.append(end)
+        return cls(starts, ends)
+
+    @classmethod
+    def from_sorted_sources(cls, *sources):
+        """
+        Fusion k-voies des périodes (datetimes) de plusieurs sources, chacune déjà triée
+        par début (comme celles retournées par get_busy_times), en O(n log k) et sans
+        construire de liste concaténée intermédiaire.
+        """
+        return cls.from_sorted_pairs(merge_sorted(*(
+            ((to_epoch_us(start), to_epoch_us(end)) for start, end in source) for source in sources
+        )))
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """Construit l'ensemble à partir de paires (début, fin) d'entiers quelconques."""
+        return cls.from_sorted_pairs(sorted(pairs))
+
+    @classmethod
+    def from_datetimes(cls, pairs):
+        """Construit l'ensemble à partir de paires (début, fin) de datetimes avec fuseau horaire."""
+        return cls.from_pairs((to_epoch_us(start), to_epoch_us(end)) for start, end in pairs)
+
+    @classmethod
+    def coerce(cls, value):
+        """Retourne value s'il s'agit déjà d'un IntervalSet, sinon le construit depuis des datetimes."""
+        if isinstance(value, cls):
+            return value
+        return cls.from_datetimes(value or [])
+
+    def to_datetimes(self):
+        """Retourne la liste [(start_datetime_utc, end_datetime_utc), ...]."""
+        return [(from_epoch_us(start), from_epoch_us(end)) for start, end in zip(self.starts, self.ends)]
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __bool__(self):
+        return len(self.starts) > 0
+
+    def __eq__(self, other):
+        if not isinstance(other, IntervalSet):
+            return NotImplemented
+        return self.starts == other.starts and self.ends == other.ends
+
+    def __repr__(self):
+        return f"IntervalSet({list(self)!r})"
+
+    def overlaps(self, start, end):
+        """
+        Indique si [start, end[ (entiers ou datetimes) chevauche au moins un intervalle,
+        par recherche dichotomique : O(log n).
+        """
+        if isinstance(start, datetime):
+            start = to_epoch_us(start)
+        if isinstance(end, datetime):
+            end = to_epoch_us(end)
+        # Les intervalles étant disjoints et triés, les fins sont triées elles aussi :
+        # le premier intervalle se terminant après start est le seul candidat.
+        index = bisect_right(self.ends, start)
+        return index < len(self.starts) and self.starts[index] < end
+
+    # --- Opérations ensemblistes ---
+
+    def union(self, *others):
+        """Réunion avec un ou plusieurs autres ensembles (fusion linéaire des tableaux triés)."""
+        return IntervalSet.from_sorted_pairs(merge_sorted(self, *others))
+
+    def intersect(self, other):
+        """Intersection avec un autre ensemble."""
+        a_starts, a_ends, b_starts, b_ends = self.starts, self.ends, other.starts, other.ends
+        starts = array('q')
+        ends = array('q')
+        i = j = 0
+        while i < len(a_starts) and j < len(b_starts):
+            start = max(a_starts[i], b_starts[j])
+            end = min(a_ends[i], b_ends[j])
+            if start < end:
+                starts.append(start)
+                ends.append(end)
+            if a_ends[i] < b_ends[j]:
+                i += 1
+            else:
+                j += 1
+        return IntervalSet(starts, ends)
+
+    def subtract(self, other):
+        """Différence : les parties de cet ensemble qui ne sont pas couvertes par other."""
+        b_starts, b_ends = other.starts, other.ends
+        starts = array('q')
+        ends = array('q')
+        j = 0
+        for start, end in zip(self.starts, self.ends):
+            while j < len(b_starts) and b_ends[j] <= start:
+                j += 1
+            k = j
+            while k < len(b_starts) and b_starts[k] < end:
+                if b_starts[k] > start:
+                    starts.append(start)
+                    ends.append(b_starts[k])
+                start = max(start, b_ends[k])
+                if start >= end:
+                    break
+                k += 1
+            if start < end:
+                starts.append(start)
+                ends.append(end)
+        return IntervalSet(starts, ends)
+
+    def dilate(self, before, after=None):
+        """
+        Élargit chaque intervalle de before avant et after après (after = before par défaut),
+        puis refusionne. Les durées sont des timedelta ou des microsecondes.
+        """
+        before_us = _duration_us(before)
+        after_us = before_us if after is None else _duration_us(after)
+        return IntervalSet.from_sorted_pairs(
+            (start - before_us, end + after_us) for start, end in zip(self.starts, self.ends)
+        )
+
+    def clip(self, window_start, window_end):
+        """Tronque l'ensemble à la fenêtre [window_start, window_end[ (entiers ou datetimes)."""
+        if isinstance(window_start, datetime):
+            window_start = to_epoch_us(window_start)
+        if isinstance(window_end, datetime):
+            window_end = to_epoch_us(window_end)
+        starts = array('q')
+        ends = array('q')
+        # Seuls les intervalles qui finissent après le début et commencent avant la fin de la
+        # fenêtre sont parcourus (recherche dichotomique), pas l'ensemble entier
+        first = bisect_right(self.ends, window_start)
+        last = bisect_left(self.starts, window_end)
+        for start, end in zip(self.starts[first:last], self.ends[first:last]):
+            start = max(start, window_start)
+            end = min(end, window_end)
+            if start < end:
+                starts.append(start)
+                ends.append(end)
+        return IntervalSet(starts, ends)
+
+# --- Fin de intervals.py ---
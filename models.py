@@ -18,6 +18,13 @@ class Activity(db.Model):
             'category': self.category
         }
 
+class ScheduleCacheEntry(db.Model):
+    """Planning généré, indexé par l'empreinte de ses entrées (niveau persistant du cache des plannings)."""
+    digest = db.Column(db.String(64), primary_key=True)
+    # Événements sérialisés en JSON (instants en microsecondes depuis l'epoch)
+    events = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+
 # Optionnel : Pour stocker des paramètres comme l'URL du calendrier si on ne veut pas utiliser .env
 # class Setting(db.Model):
 #     key = db.Column(db.String(50), primary_key=True)
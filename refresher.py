@@ -0,0 +1,196 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextvars import copy_context
+from calendar_utils import load_busy_times, busy_times_digest
+
+class BusyTimesRefresher:
+    """
+    Conserve le dernier instantané valide des périodes occupées de chaque calendrier source
+    et le rafraîchit en arrière-plan (stale-while-revalidate).
+
+    La route du flux lit les instantanés immédiatement : un instantané trop ancien est servi
+    tel quel pendant qu'un rafraîchissement asynchrone est lancé, et un échec de téléchargement
+    ou de parsing conserve l'instantané précédent.
+    """
+
+    def __init__(self, max_age=300, refresh_intervals=None, cache_dir=None, max_workers=4, idle_expiry=86400, parser='full'):
+        """
+        Args:
+            max_age (float): Âge (en secondes) au-delà duquel un instantané est considéré périmé.
+            refresh_intervals (dict): Intervalle de rafraîchissement propre à certaines URLs {url: secondes}.
+            cache_dir (str): Dossier du cache HTTP conditionnel (None pour désactiver le cache).
+            max_workers (int): Nombre maximum de téléchargements simultanés.
+            idle_expiry (float): Durée (en secondes) après laquelle une plage non demandée est oubliée.
+            parser (str): 'full' ou 'stream' (voir calendar_utils.get_busy_times).
+        """
+        self.max_age = max_age
+        self.refresh_intervals = refresh_intervals or {}
+        self.cache_dir = cache_dir
+        self.idle_expiry = idle_expiry
+        self.parser = parser
+        self._snapshots = {} # {(url, start_date, end_date, target_tz): instantané}
+        self._in_flight = {} # {clé: Future} pour ne jamais lancer deux rafraîchissements identiques
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='nexday-refresh')
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def _interval_for(self, calendar_url):
+        return self.refresh_intervals.get(calendar_url, self.max_age)
+
+    def _refresh(self, key):
+        """Télécharge et parse une source, puis remplace son instantané si tout s'est bien passé."""
+        calendar_url, start_date, end_date, target_tz = key
+        started = time.perf_counter()
+        try:
+            busy_times = load_busy_times(calendar_url, start_date, end_date, target_tz=target_tz,
+                                         cache_dir=self.cache_dir, parser=self.parser)
+        except Exception as e:
+            print(f"Erreur lors du rafraîchissement du calendrier {calendar_url[:50]}...: {e}")
+            with self._lock:
+                snapshot = self._snapshots.get(key)
+                if snapshot is not None:
+                    snapshot['error'] = str(e) # Conserver les données périmées
+                self._in_flight.pop(key, None)
+            return
+
+        with self._lock:
+            previous = self._snapshots.get(key)
+            self._snapshots[key] = {
+                'busy_times': busy_times,
+                'digest': busy_times_digest(busy_times), # Version de l'instantané (validateurs HTTP)
+                'fetched_at': time.time(),
+                'duration': time.perf_counter() - started,
+                'requested_at': previous['requested_at'] if previous else time.time(),
+                'error': None,
+            }
+            self._in_flight.pop(key, None)
+
+    def _schedule_refresh(self, key):
+        """Lance un rafraîchissement asynchrone de la clé (sauf s'il y en a déjà un en cours)."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._executor.submit(copy_context().run, self._refresh, key) # Trace de la requête qui l'a déclenché
+                self._in_flight[key] = future
+            return future
+
+    def get_busy_times(self, calendar_urls, start_date, end_date, target_tz='UTC', deadline=None):
+        """
+        Retourne les périodes occupées de chaque source à partir des instantanés en mémoire.
+
+        Seules les sources sans aucun instantané sont téléchargées de façon synchrone
+        (en parallèle, sous l'échéance globale) ; les instantanés périmés sont servis
+        immédiatement et rafraîchis en arrière-plan.
+
+        Args:
+            calendar_urls (list): Liste des URLs des fichiers .ics publics.
+            start_date (datetime.date): Date de début de la période.
+            end_date (datetime.date): Date de fin de la période.
+            target_tz (str): Fuseau horaire cible (ex: 'Europe/Paris').
+            deadline (float): Échéance globale en secondes pour les sources jamais chargées.
+
+        Returns:
+            list: Une liste de dictionnaires, dans le même ordre que calendar_urls :
+                  {'url', 'busy_times', 'duration', 'status'} où status vaut 'ok', 'stale',
+                  'error' ou 'timeout'.
+        """
+        keys = [(calendar_url, start_date, end_date, target_tz) for calendar_url in calendar_urls]
+        now = time.time()
+
+        pending = []
+        with self._lock:
+            for key in keys:
+                snapshot = self._snapshots.get(key)
+                if snapshot is None:
+                    pending.append(key)
+                else:
+                    snapshot['requested_at'] = now
+        if pending:
+            wait([self._schedule_refresh(key) for key in pending], timeout=deadline)
+
+        results = []
+        for key in keys:
+            calendar_url = key[0]
+            with self._lock:
+                snapshot = self._snapshots.get(key)
+                still_running = key in self._in_flight
+            if snapshot is None:
+                status = 'timeout' if still_running else 'error'
+                results.append({'url': calendar_url, 'busy_times': [], 'duration': 0.0, 'status': status})
+                continue
+
+            is_stale = now - snapshot['fetched_at'] > self._interval_for(calendar_url)
+            if is_stale:
+                self._schedule_refresh(key) # Servir l'instantané actuel, rafraîchir en arrière-plan
+            status = 'stale' if is_stale or snapshot['error'] else 'ok'
+            results.append({
+                'url': calendar_url,
+                'busy_times': snapshot['busy_times'],
+                'duration': snapshot['duration'],
+                'status': status
+            })
+        return results
+
+    def peek_digests(self, calendar_urls, start_date, end_date, target_tz='UTC'):
+        """
+        Empreintes des instantanés de chaque source, sans aucun téléchargement ni parsing,
+        pour calculer un validateur HTTP avant de générer le flux. Comme get_busy_times,
+        les instantanés périmés sont rafraîchis en arrière-plan.
+
+        Returns:
+            list: Les empreintes dans l'ordre de calendar_urls, ou None si une source n'a
+                  encore aucun instantané (il faut alors passer par get_busy_times).
+        """
+        keys = [(calendar_url, start_date, end_date, target_tz) for calendar_url in calendar_urls]
+        now = time.time()
+        digests = []
+        stale = []
+        with self._lock:
+            for key in keys:
+                snapshot = self._snapshots.get(key)
+                if snapshot is None:
+                    return None
+                snapshot['requested_at'] = now
+                digests.append(snapshot['digest'])
+                if now - snapshot['fetched_at'] > self._interval_for(key[0]):
+                    stale.append(key)
+        for key in stale:
+            self._schedule_refresh(key)
+        return digests
+
+    def refresh_due(self):
+        """Rafraîchit les instantanés arrivés à échéance et oublie les plages plus demandées."""
+        now = time.time()
+        with self._lock:
+            for key in [k for k, snap in self._snapshots.items() if now - snap['requested_at'] > self.idle_expiry]:
+                del self._snapshots[key]
+            due = [key for key, snap in self._snapshots.items()
+                   if now - snap['fetched_at'] > self._interval_for(key[0])]
+        for key in due:
+            self._schedule_refresh(key)
+
+    def _run(self, poll_interval):
+        while not self._stop_event.wait(poll_interval):
+            try:
+                self.refresh_due()
+            except Exception as e:
+                print(f"Erreur dans le rafraîchissement en arrière-plan: {e}")
+
+    def start(self, poll_interval=30):
+        """Démarre le thread de rafraîchissement en arrière-plan (thread démon)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(poll_interval,), name='nexday-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrête le thread de rafraîchissement en arrière-plan."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+# --- Fin de refresher.py ---
@@ -0,0 +1,82 @@
+import json
+from datetime import datetime
+import pytz # Pour les fuseaux horaires
+from cache_utils import LRUCache
+from intervals import to_epoch_us, from_epoch_us
+from models import db, ScheduleCacheEntry
+
+def events_to_json(events):
+    """Sérialise les événements planifiés (instants en microsecondes depuis l'epoch)."""
+    return json.dumps([
+        [event['name'], event['category'], to_epoch_us(event['start_utc']), to_epoch_us(event['end_utc']), event.get('activity_id')]
+        for event in events
+    ])
+
+
+def events_from_json(data):
+    """Reconstruit les événements planifiés sérialisés par events_to_json."""
+    return [{
+        'name': name,
+        'category': category,
+        'start_utc': from_epoch_us(start_us),
+        'end_utc': from_epoch_us(end_us),
+        'activity_id': activity_id
+    } for name, category, start_us, end_us, activity_id in json.loads(data)]
+
+
+class ScheduleCache:
+    """
+    Cache des plannings générés, indexé par l'empreinte de leurs entrées (voir
+    scheduler.schedule_digest). Niveau mémoire à éviction LRU et niveau persistant
+    optionnel dans la base SQLite de l'application (table ScheduleCacheEntry),
+    qui survit aux redémarrages et est partagé entre les processus.
+    """
+
+    def __init__(self, max_entries=64, persistent=False, max_persistent_entries=256):
+        """
+        Args:
+            max_entries (int): Nombre maximum de plannings conservés en mémoire.
+            persistent (bool): Utiliser aussi la base SQLite (nécessite un contexte d'application).
+            max_persistent_entries (int): Nombre maximum de plannings conservés en base.
+        """
+        self.persistent = persistent
+        self.max_persistent_entries = max_persistent_entries
+        self._memory = LRUCache(max_entries)
+
+    def get(self, digest):
+        """Retourne une copie de la liste des événements en cache pour digest, ou None."""
+        events = self._memory.get(digest)
+        if events is None and self.persistent:
+            try:
+                entry = db.session.get(ScheduleCacheEntry, digest)
+            except Exception as e:
+                print(f"Avertissement: Lecture du cache des plannings impossible: {e}")
+                db.session.rollback()
+                return None
+            if entry is None:
+                return None
+            events = tuple(events_from_json(entry.events))
+            self._memory.set(digest, events)
+        return [dict(event) for event in events] if events is not None else None
+
+    def set(self, digest, events):
+        """Enregistre la liste des événements planifiés associée à digest."""
+        self._memory.set(digest, tuple(dict(event) for event in events))
+        if not self.persistent:
+            return
+        try:
+            db.session.merge(ScheduleCacheEntry(digest=digest, events=events_to_json(events), created_at=datetime.now(pytz.utc).replace(tzinfo=None)))
+            # Ne garder que les plannings les plus récents
+            stale = ScheduleCacheEntry.query.order_by(ScheduleCacheEntry.created_at.desc()).offset(self.max_persistent_entries).all()
+            for entry in stale:
+                db.session.delete(entry)
+            db.session.commit()
+        except Exception as e:
+            print(f"Avertissement: Écriture du cache des plannings impossible: {e}")
+            db.session.rollback()
+
+    def clear(self):
+        """Vide le niveau mémoire (le niveau persistant est indexé par empreinte et n'a pas besoin d'être vidé)."""
+        self._memory.clear()
+
+# --- Fin de schedule_cache.py ---
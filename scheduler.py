@@ -1,158 +1,204 @@
-from datetime import datetime, timedelta, time, date
+import hashlib
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
 import pytz # Import pytz for timezone handling
+from array import array
 from collections import defaultdict
+from functools import lru_cache
+from intervals import IntervalSet, to_epoch_us, from_epoch_us
+from flow_utils import MinCostFlow
+from improver import improve_schedule, repair_schedule
+from tracing import current_trace
+from tz_utils import OffsetTable, EPOCH_DATE, US_PER_DAY, local_hour, local_day, local_weekday
+
+try:
+    import numpy as np # Optionnel : moteur vectorisé de la grille de créneaux
+except ImportError:
+    np = None
 
 # --- Configuration Constants ---
 WORKING_HOUR_START = 9  # 9 AM
 WORKING_HOUR_END = 22 # 10 PM
 LUNCH_START_HOUR = 12 # 12 PM
 LUNCH_END_HOUR = 15   # 3 PM (exclusive, so includes 14:00-14:59)
-MIN_GAP_MINUTES = 30    # Minimum 30 minutes between scheduled events
+MIN_GAP_MINUTES = 30    # Minimum 30 minutes between scheduled events (between blocks with contiguous_blocks)
 MAX_CONTINUOUS_MINUTES_PER_ACTIVITY = 120 # Max 2 hours for a single activity block
 BUSY_TIME_BUFFER_MINUTES = 60 # 1 hour buffer before/after external events
 # Define the local timezone used for working hours and daily constraints
 # This should ideally match the one used in app.py
 LOCAL_TZ_NAME = 'Europe/Paris'
+WEEK_TEMPLATE_CACHE_SIZE = 64 # Nombre de modèles de semaine (créneaux éligibles) gardés en cache
+SCHEDULER_ENGINES = ('greedy', 'flow') # Moteurs de placement disponibles
+FLOW_SPREAD_COST = 1 # Coût (moteur 'flow') d'un créneau supplémentaire de la même activité le même jour
+FLOW_RELAXATION_COST = 100 # Coût (moteur 'flow') d'un créneau au-delà d'un par catégorie et par jour
+SCHEDULER_REVISION = 2 # À incrémenter quand les règles de placement changent : invalide les plannings en cache et les ETag
 # --- End Configuration ---
+US_PER_WEEK = 7 * US_PER_DAY
 
-def generate_schedule(activities, busy_times_utc, week_start_utc, week_end_utc, local_tz_name=LOCAL_TZ_NAME, slot_duration_minutes=30):
-    """
-    Répartit les activités dans les créneaux disponibles d'une semaine,
-    en respectant les heures de travail, les contraintes de catégorie/jour,
-    l'espacement et la durée maximale par bloc.
 
-    Args:
-        activities (list): Liste d'objets Activity.
-        busy_times_utc (list): Liste de tuples (start_utc, end_utc) de périodes occupées.
-        week_start_utc (datetime): Début de la semaine en UTC.
-        week_end_utc (datetime): Fin de la semaine en UTC.
-        local_tz_name (str): Nom du fuseau horaire local (ex: 'Europe/Paris').
-        slot_duration_minutes (int): Durée de chaque créneau.
+def _relative_offsets(offset_table, week_start_us, week_end_us):
+    """
+    Décalages UTC du fuseau pendant la semaine, relatifs à son début : (décalage au début,
+    tuple de (instant depuis le début de semaine, décalage - décalage au début)).
+    Identique pour toutes les semaines sans changement d'heure, quel que soit leur décalage.
+    """
+    transitions_us = offset_table.transitions_us
+    first = bisect_right(transitions_us, week_start_us) - 1
+    last = max(first + 1, bisect_left(transitions_us, week_end_us))
+    base_offset_us = offset_table.offsets_us[first]
+    return base_offset_us, tuple(
+        (max(transition_us - week_start_us, 0), offset_us - base_offset_us)
+        for transition_us, offset_us in zip(transitions_us[first:last], offset_table.offsets_us[first:last])
+    )
+
+
+def _week_template(local_tz_name, week_start_us, week_end_us, slot_us,
+                   working_hour_start, working_hour_end, lunch_start_hour, lunch_end_hour, vectorized):
+    """
+    Modèle de semaine : créneaux éligibles (heures de travail, hors déjeuner, hors dimanche)
+    de la période. Le calcul ne dépend que de la position du début de semaine dans la semaine
+    locale et des changements d'heure qu'elle contient : il est mis en cache sous cette forme
+    relative, et donc réutilisé d'une semaine à l'autre (voir _relative_week_template).
 
     Returns:
-        list: Liste de dictionnaires d'événements planifiés.
+        tuple: (indices des créneaux éligibles depuis le début de semaine,
+                jours locaux (depuis le 1970-01-01) de ces créneaux), en tuples d'entiers.
     """
-    scheduled_events_final = []
-    slot_duration = timedelta(minutes=slot_duration_minutes)
-    min_gap_duration = timedelta(minutes=MIN_GAP_MINUTES)
-    max_continuous_duration = timedelta(minutes=MAX_CONTINUOUS_MINUTES_PER_ACTIVITY)
-    buffer_duration = timedelta(minutes=BUSY_TIME_BUFFER_MINUTES) # Buffer duration
-
-    try:
-        local_tz = pytz.timezone(local_tz_name)
-    except pytz.UnknownTimeZoneError:
-        print(f"Erreur: Fuseau horaire '{local_tz_name}' inconnu. Utilisation de UTC.")
-        local_tz = pytz.utc # Fallback to UTC
+    local_tz = pytz.timezone(local_tz_name)
+    # Table des décalages UTC du fuseau local pour la semaine : conversions UTC -> local
+    # par arithmétique entière plutôt qu'un astimezone par créneau
+    offset_table = OffsetTable(local_tz, from_epoch_us(week_start_us), from_epoch_us(week_end_us))
+    base_offset_us, relative_offsets = _relative_offsets(offset_table, week_start_us, week_end_us)
+    # Début de semaine en heure locale = semaines entières depuis l'epoch + position dans la semaine
+    week_count, week_phase_us = divmod(week_start_us + base_offset_us, US_PER_WEEK)
+
+    slot_indices, relative_days = _relative_week_template(
+        week_phase_us, week_end_us - week_start_us, relative_offsets, slot_us,
+        working_hour_start, working_hour_end, lunch_start_hour, lunch_end_hour, vectorized
+    )
+    first_day = week_count * 7
+    return slot_indices, tuple(first_day + day for day in relative_days)
+
+
+@lru_cache(maxsize=WEEK_TEMPLATE_CACHE_SIZE)
+def _relative_week_template(week_phase_us, week_duration_us, relative_offsets, slot_us,
+                            working_hour_start, working_hour_end, lunch_start_hour, lunch_end_hour, vectorized):
+    """
+    Créneaux éligibles d'une semaine décrite relativement à son début, mis en cache (LRU).
+    Les heures locales sont calculées comme si la semaine commençait à week_phase_us après
+    l'epoch (même jour de la semaine et même heure), les jours retournés sont donc relatifs
+    à la semaine de l'epoch. Les constantes font partie de la clé pour qu'une modification
+    invalide le modèle.
 
-    # 1. Créer tous les créneaux possibles et filtrer selon les heures de travail, de déjeuner locales ET le jour de la semaine
-    all_slots = []
-    current_time_utc = week_start_utc
-    while current_time_utc < week_end_utc:
-        slot_end_utc = current_time_utc + slot_duration
+    Returns:
+        tuple: (indices des créneaux éligibles, jours locaux relatifs de ces créneaux).
+    """
+    slot_count = max(0, -(-week_duration_us // slot_us)) # Arrondi supérieur
+    transitions_us = [transition_us for transition_us, _ in relative_offsets]
+    offsets_us = [offset_us for _, offset_us in relative_offsets]
+
+    if vectorized:
+        # Toute la grille en tableaux NumPy, masques calculés par opérations vectorielles
+        starts_us = np.arange(slot_count, dtype=np.int64) * slot_us
+        indices = np.maximum(np.searchsorted(np.array(transitions_us, dtype=np.int64), starts_us, side='right') - 1, 0)
+        local_us = week_phase_us + starts_us + np.array(offsets_us, dtype=np.int64)[indices]
+        local_hours = local_hour(local_us)
+        is_working_hour = (local_hours >= working_hour_start) & (local_hours < working_hour_end)
+        is_lunch_hour = (local_hours >= lunch_start_hour) & (local_hours < lunch_end_hour)
+        is_sunday = local_weekday(local_us) == 6
+        eligible = np.flatnonzero(is_working_hour & ~is_lunch_hour & ~is_sunday)
+        return tuple(eligible.tolist()), tuple(local_day(local_us[eligible]).tolist())
+
+    slot_indices = []
+    slot_local_days = []
+    for slot_index in range(slot_count):
         # Convertir le début du créneau en heure locale pour vérifier les heures de travail/déjeuner/jour
-        current_time_local = current_time_utc.astimezone(local_tz)
-        slot_hour_local = current_time_local.hour
-        slot_weekday_local = current_time_local.weekday() # 0 = Lundi, 6 = Dimanche
+        slot_start_us = slot_index * slot_us
+        current_local_us = week_phase_us + slot_start_us + offsets_us[bisect_right(transitions_us, slot_start_us) - 1]
+        slot_hour_local = local_hour(current_local_us)
+        slot_weekday_local = local_weekday(current_local_us) # 0 = Lundi, 6 = Dimanche
 
         # Vérifier si le créneau est DANS les heures de travail ET HORS des heures de déjeuner ET PAS un dimanche
-        is_working_hour = WORKING_HOUR_START <= slot_hour_local < WORKING_HOUR_END
-        is_lunch_hour = LUNCH_START_HOUR <= slot_hour_local < LUNCH_END_HOUR
+        is_working_hour = working_hour_start <= slot_hour_local < working_hour_end
+        is_lunch_hour = lunch_start_hour <= slot_hour_local < lunch_end_hour
         is_sunday = slot_weekday_local == 6 # Vérifier si c'est dimanche
 
-        if is_working_hour and not is_lunch_hour and not is_sunday: # Ajout de 'and not is_sunday'
-            all_slots.append({
-                'start': current_time_utc,
-                'end': slot_end_utc,
-                'available': True,
-                'local_date': current_time_local.date() # Stocker la date locale
-            })
-        current_time_utc = slot_end_utc
+        if is_working_hour and not is_lunch_hour and not is_sunday:
+            slot_indices.append(slot_index)
+            slot_local_days.append(local_day(current_local_us)) # Stocker la date locale
+    return tuple(slot_indices), tuple(slot_local_days)
 
-    # 2. Appliquer le buffer aux périodes occupées externes et les fusionner
-    buffered_busy_times_utc = []
-    for busy_start, busy_end in busy_times_utc:
-        # Apply buffer, ensuring start doesn't go before week_start and end doesn't go after week_end
-        buffered_start = max(week_start_utc, busy_start - buffer_duration)
-        buffered_end = min(week_end_utc, busy_end + buffer_duration)
-        # Only add if the interval is still valid after buffering
-        if buffered_start < buffered_end:
-            buffered_busy_times_utc.append((buffered_start, buffered_end))
-
-    # Merge overlapping/adjacent buffered intervals
-    merged_buffered_busy_times_utc = []
-    if buffered_busy_times_utc:
-        buffered_busy_times_utc.sort() # Sort by start time
-        current_start, current_end = buffered_busy_times_utc[0]
-        for next_start, next_end in buffered_busy_times_utc[1:]:
-            # Check for overlap or adjacency (<= allows adjacent intervals to merge)
-            if next_start <= current_end:
-                current_end = max(current_end, next_end) # Extend the current interval
-            else:
-                # No overlap, finalize the current interval and start a new one
-                merged_buffered_busy_times_utc.append((current_start, current_end))
-                current_start, current_end = next_start, next_end
-        # Add the last merged interval
-        merged_buffered_busy_times_utc.append((current_start, current_end))
 
-    # 3. Marquer les créneaux occupés (en utilisant les périodes bufferisées et fusionnées)
-    for busy_start, busy_end in merged_buffered_busy_times_utc: # Use the merged buffered list
-        for slot in all_slots:
-            # Check for overlap: slot_start < busy_end AND slot_end > busy_start
-            if slot['start'] < busy_end and slot['end'] > busy_start:
-                slot['available'] = False
+def _vectorized_availability(week_start_us, slot_us, slot_indices, buffered_busy):
+    """
+    Vecteur booléen de disponibilité des créneaux : un créneau est occupé si la première
+    période se terminant après son début commence avant sa fin (recherche vectorielle).
+    """
+    starts_us = week_start_us + np.array(slot_indices, dtype=np.int64) * slot_us
+    busy_starts = np.frombuffer(buffered_busy.starts, dtype=np.int64) if buffered_busy else np.empty(0, dtype=np.int64)
+    busy_ends = np.frombuffer(buffered_busy.ends, dtype=np.int64) if buffered_busy else np.empty(0, dtype=np.int64)
+    candidates = np.searchsorted(busy_ends, starts_us, side='right')
+    has_candidate = candidates < len(busy_starts)
+    is_busy = np.zeros(len(starts_us), dtype=bool)
+    is_busy[has_candidate] = busy_starts[candidates[has_candidate]] < starts_us[has_candidate] + slot_us
+    return ~is_busy
 
-    # 4. Préparer les besoins en temps pour chaque activité (Renumbered from 3)
-    activity_needs = []
-    total_slots_needed = 0
-    for activity in activities:
-        slots_needed = round(activity.weekly_minutes / slot_duration_minutes)
-        if slots_needed > 0:
-            activity_needs.append({
-                'activity': activity,
-                'slots_remaining': slots_needed,
-            })
-            total_slots_needed += slots_needed
 
-    if not activity_needs:
-        print("Aucune activité à planifier.")
-        return []
+def _greedy_placement(activity_needs, slot_minutes, slot_days, slot_duration_minutes, week_start_utc, local_tz, contiguous_blocks=False):
+    """
+    Placement glouton : parcourt les créneaux dans l'ordre chronologique et y place les
+    activités à tour de rôle (round-robin), en relaxant la contrainte de catégorie si besoin.
+    Avec contiguous_blocks, un créneau qui suit immédiatement le précédent peut prolonger le
+    bloc de la même activité (jusqu'à MAX_CONTINUOUS_MINUTES_PER_ACTIVITY) sans respecter
+    MIN_GAP_MINUTES.
 
-    # 5. Algorithme de placement amélioré avec relaxation progressive
-    scheduled_slots_details = [] # Stocke les détails des créneaux assignés
-    scheduled_slots_by_day = defaultdict(lambda: defaultdict(int)) # {date: {category: count}}
-    last_event_end_utc = None # Fin du dernier événement planifié par NOUS
-    last_activity_info = {'id': None, 'continuous_duration': timedelta(0)} # Pour suivre la durée consécutive
+    Args:
+        activity_needs (list): Besoins {'activity', 'slots_remaining'} (slots_remaining est décrémenté).
+        slot_minutes (array): Début des créneaux disponibles, en minutes depuis le début de semaine.
+        slot_days (array): Jour local (depuis le 1970-01-01) de chaque créneau.
+        slot_duration_minutes (int): Durée de chaque créneau.
+        week_start_utc (datetime): Début de la semaine en UTC (pour les messages).
+        local_tz (pytz.BaseTzInfo): Fuseau horaire local (pour les messages).
+        contiguous_blocks (bool): Autoriser les blocs de créneaux contigus d'une même activité.
 
-    available_slots = [slot for slot in all_slots if slot['available']]
-    available_slots.sort(key=lambda s: s['start']) # Assurer l'ordre chronologique
+    Returns:
+        tuple: (activités planifiées, débuts en minutes des créneaux correspondants).
+    """
+    activity_needs = list(activity_needs) # Les besoins satisfaits sont retirés de cette copie
+    scheduled_activities = [] # Activité de chaque créneau assigné
+    scheduled_minutes = array('l') # Début (en minutes) de chaque créneau assigné
+    scheduled_slots_by_day = defaultdict(lambda: defaultdict(int)) # {jour local: {category: count}}
+    last_event_end_minute = None # Fin du dernier événement planifié par NOUS
+    last_activity_info = {'id': None, 'continuous_minutes': 0} # Pour suivre la durée consécutive
 
     activity_index = 0 # Pour le round-robin
     slots_scheduled_count = 0
+    total_slots_needed = sum(need['slots_remaining'] for need in activity_needs)
 
     # Itérer tant qu'il reste des besoins et des créneaux disponibles
     processed_slot_indices = set() # Pour éviter de revérifier sans fin un créneau inutilisable
     slot_idx = 0
-    while slots_scheduled_count < total_slots_needed and activity_needs and slot_idx < len(available_slots):
+    while slots_scheduled_count < total_slots_needed and activity_needs and slot_idx < len(slot_minutes):
 
-        slot = available_slots[slot_idx]
-        slot_local_date = slot['local_date'] # Get local date for the slot
+        slot_start_minute = slot_minutes[slot_idx]
+        slot_end_minute = slot_start_minute + slot_duration_minutes
+        slot_local_day = slot_days[slot_idx] # Jour local du créneau
 
         # Si ce créneau a déjà été traité sans succès pour toutes les activités, passer au suivant
         if slot_idx in processed_slot_indices:
              slot_idx += 1
              continue
 
-        # --- Vérifications préliminaires pour le créneau ---
-        # A. Est-il disponible ? (Redondant car on itère sur available_slots, mais sécurité)
-        if not slot['available']:
-            slot_idx += 1
-            continue
-
-        # B. Respecte-t-il l'espacement minimum ?
+        # --- Vérification préliminaire pour le créneau ---
+        # (seuls les créneaux disponibles sont parcourus, chacun une seule fois)
+        # Respecte-t-il l'espacement minimum ?
         # Check against the end time of the last *scheduled* event by this algorithm
-        if last_event_end_utc is not None and slot['start'] < last_event_end_utc + min_gap_duration:
-            # Ce créneau est trop proche du précédent événement planifié par nous.
-            # On ne peut rien y mettre. Marquer comme traité pour ne pas le retenter.
+        within_gap = last_event_end_minute is not None and slot_start_minute < last_event_end_minute + MIN_GAP_MINUTES
+        can_continue_block = (contiguous_blocks and slot_start_minute == last_event_end_minute and
+                              last_activity_info['continuous_minutes'] + slot_duration_minutes <= MAX_CONTINUOUS_MINUTES_PER_ACTIVITY)
+        if within_gap and not can_continue_block:
+            # Ce créneau est trop proche du précédent événement planifié par nous,
+            # sans pouvoir prolonger son bloc. Marquer comme traité pour ne pas le retenter.
             processed_slot_indices.add(slot_idx)
             slot_idx += 1
             continue
@@ -172,21 +218,23 @@ def generate_schedule(activities, busy_times_utc, week_start_utc, week_end_utc,
 
             # Calculer la durée continue potentielle si cette activité est placée ici
             is_continuing = (last_activity_info['id'] == activity.id and
-                             last_event_end_utc is not None and
-                             slot['start'] == last_event_end_utc) # Strictement consécutif
-            potential_continuous_duration = (last_activity_info['continuous_duration'] if is_continuing else timedelta(0)) + slot_duration
+                             last_event_end_minute is not None and
+                             slot_start_minute == last_event_end_minute) # Strictement consécutif
+            potential_continuous_minutes = (last_activity_info['continuous_minutes'] if is_continuing else 0) + slot_duration_minutes
 
-            # 1. Vérification Stricte
-            strict_category_ok = scheduled_slots_by_day[slot_local_date][activity.category] < 1
-            strict_duration_ok = potential_continuous_duration <= max_continuous_duration
+            # 1. Vérification Stricte (prolonger un bloc ne compte pas comme une relaxation de catégorie)
+            strict_category_ok = (contiguous_blocks and is_continuing) or scheduled_slots_by_day[slot_local_day][activity.category] < 1
+            strict_duration_ok = potential_continuous_minutes <= MAX_CONTINUOUS_MINUTES_PER_ACTIVITY
 
-            if strict_category_ok and strict_duration_ok:
+            if within_gap and not is_continuing:
+                pass # Dans l'espacement minimum, seule l'activité du bloc en cours peut être placée
+            elif strict_category_ok and strict_duration_ok:
                 can_schedule = True
                 relaxation_used = "Strict"
             else:
                 # 2. Vérification avec Relaxation Catégorie (si échec strict)
                 # Ignorer la contrainte de catégorie, mais vérifier toujours la durée max
-                relaxed_cat_duration_ok = potential_continuous_duration <= max_continuous_duration
+                relaxed_cat_duration_ok = potential_continuous_minutes <= MAX_CONTINUOUS_MINUTES_PER_ACTIVITY
                 if relaxed_cat_duration_ok:
                     # On peut planifier en relaxant la catégorie, si la durée est ok
                     can_schedule = True
@@ -198,28 +246,27 @@ def generate_schedule(activities, busy_times_utc, week_start_utc, week_end_utc,
             # --- Placement si l'une des vérifications a réussi ---
             if can_schedule:
                 if relaxation_used == "Relaxed Category":
-                     print(f"Info: Placement de '{activity.name}' le {slot_local_date} en relaxant la contrainte de catégorie (slot: {slot['start'].astimezone(local_tz).strftime('%H:%M')}).")
+                     slot_local_date = EPOCH_DATE + timedelta(days=slot_local_day)
+                     slot_start_local = (week_start_utc + timedelta(minutes=slot_start_minute)).astimezone(local_tz)
+                     print(f"Info: Placement de '{activity.name}' le {slot_local_date} en relaxant la contrainte de catégorie (slot: {slot_start_local.strftime('%H:%M')}).")
 
                 # Assigner le créneau
-                slot['available'] = False # Marquer comme utilisé globalement
                 need['slots_remaining'] -= 1
                 slots_scheduled_count += 1
 
                 # Mettre à jour les suivis
-                scheduled_slots_by_day[slot_local_date][activity.category] += 1 # Toujours compter, même si relaxé
-                last_event_end_utc = slot['end'] # Mettre à jour la fin du dernier event planifié par NOUS
+                scheduled_slots_by_day[slot_local_day][activity.category] += 1 # Toujours compter, même si relaxé
+                last_event_end_minute = slot_end_minute # Mettre à jour la fin du dernier event planifié par NOUS
 
                 # Mettre à jour le suivi de l'activité continue
                 if is_continuing:
-                    last_activity_info['continuous_duration'] += slot_duration
+                    last_activity_info['continuous_minutes'] += slot_duration_minutes
                 else: # Nouvelle activité ou bloc non contigu
-                    last_activity_info = {'id': activity.id, 'continuous_duration': slot_duration}
+                    last_activity_info = {'id': activity.id, 'continuous_minutes': slot_duration_minutes}
 
-                # Ajouter aux détails planifiés
-                scheduled_slots_details.append({
-                    'activity': activity,
-                    'slot': slot
-                })
+                # Ajouter aux créneaux planifiés
+                scheduled_activities.append(activity)
+                scheduled_minutes.append(slot_start_minute)
 
                 # Si l'activité est terminée, la retirer de la liste des besoins
                 if need['slots_remaining'] == 0:
@@ -254,24 +301,415 @@ def generate_schedule(activities, busy_times_utc, week_start_utc, week_end_utc,
         # Passer au créneau suivant dans tous les cas (qu'on ait placé ou non)
         slot_idx += 1
 
+    return scheduled_activities, scheduled_minutes
+
+
+def _flow_placement(activity_needs, slot_minutes, slot_days, slot_duration_minutes, contiguous_blocks=False):
+    """
+    Placement par flot à coût minimum.
+
+    1. Sélection des créneaux utilisables : le premier créneau disponible, puis chaque
+       créneau commençant au moins MIN_GAP_MINUTES après la fin du précédent retenu
+       (les créneaux ayant tous la même durée, ce choix en retient le plus grand nombre).
+       Avec contiguous_blocks, les créneaux contigus au précédent retenu le sont aussi, par
+       suites d'au plus MAX_CONTINUOUS_MINUTES_PER_ACTIVITY (un bloc potentiel).
+    2. Réseau source -> activité -> (jour, catégorie) -> jour -> puits : la capacité d'une
+       activité est son besoin, celle d'un jour son nombre de créneaux retenus. Un créneau par
+       catégorie et par jour est gratuit, les suivants coûtent FLOW_RELAXATION_COST (relaxation
+       de catégorie) ; répéter une activité le même jour coûte FLOW_SPREAD_COST. Le flot
+       maximal de coût minimal planifie donc le plus de créneaux retenus à l'étape 1, puis relaxe
+       le moins possible. Sans contiguous_blocks, le placement glouton remplit déjà tous ces
+       créneaux : le gain porte sur les relaxations, pas sur le temps planifié. Avec
+       contiguous_blocks, le réseau ne modélise pas les blocs et le glouton peut planifier plus.
+    3. Dans chaque jour, les créneaux sont attribués en alternant les activités. Un créneau
+       contigu au précédent prolonge le bloc de son activité (dans la limite de
+       MAX_CONTINUOUS_MINUTES_PER_ACTIVITY), ou reste libre s'il est trop proche du bloc précédent.
+    4. Avec contiguous_blocks, les besoins qui n'ont pas trouvé place dans les blocs sont
+       complétés dans les créneaux libres restants (voir improver.repair_schedule).
+
+    Args:
+        activity_needs (list): Besoins {'activity', 'slots_remaining'} (slots_remaining est décrémenté).
+        slot_minutes (array): Début des créneaux disponibles, en minutes depuis le début de semaine.
+        slot_days (array): Jour local (depuis le 1970-01-01) de chaque créneau.
+        slot_duration_minutes (int): Durée de chaque créneau.
+        contiguous_blocks (bool): Autoriser les blocs de créneaux contigus d'une même activité.
+
+    Returns:
+        tuple: (activités planifiées, débuts en minutes des créneaux correspondants).
+    """
+    # 1. Créneaux respectant l'espacement minimum, regroupés par jour local
+    minutes_by_day = defaultdict(list) # {jour local: [début en minutes, ...]}
+    last_end_minute = None
+    run_minutes = 0 # Durée de la suite de créneaux contigus en cours
+    for slot_start_minute, slot_local_day in zip(slot_minutes, slot_days):
+        if contiguous_blocks and slot_start_minute == last_end_minute and \
+                run_minutes + slot_duration_minutes <= MAX_CONTINUOUS_MINUTES_PER_ACTIVITY:
+            run_minutes += slot_duration_minutes
+        elif last_end_minute is None or slot_start_minute >= last_end_minute + MIN_GAP_MINUTES:
+            run_minutes = slot_duration_minutes
+        else:
+            continue
+        minutes_by_day[slot_local_day].append(slot_start_minute)
+        last_end_minute = slot_start_minute + slot_duration_minutes
+    days = sorted(minutes_by_day)
+    categories = sorted({need['activity'].category for need in activity_needs})
+    if not days:
+        return [], array('l')
+
+    # 2. Réseau de flot : nœuds source, activités, (jour, catégorie), jours, puits
+    source = 0
+    first_activity_node = 1
+    first_day_category_node = first_activity_node + len(activity_needs)
+    first_day_node = first_day_category_node + len(days) * len(categories)
+    sink = first_day_node + len(days)
+    network = MinCostFlow(sink + 1)
+    category_positions = {category: position for position, category in enumerate(categories)}
+    total_slots_needed = sum(need['slots_remaining'] for need in activity_needs)
+
+    activity_edges = [] # [(index du besoin, position du jour, [arcs])]
+    for need_index, need in enumerate(activity_needs):
+        activity_node = first_activity_node + need_index
+        network.add_edge(source, activity_node, need['slots_remaining'])
+        category_position = category_positions[need['activity'].category]
+        for day_position in range(len(days)):
+            day_category_node = first_day_category_node + day_position * len(categories) + category_position
+            activity_edges.append((need_index, day_position, [
+                network.add_edge(activity_node, day_category_node, 1),
+                network.add_edge(activity_node, day_category_node, total_slots_needed, FLOW_SPREAD_COST),
+            ]))
+    for day_position, day in enumerate(days):
+        day_node = first_day_node + day_position
+        for category_position in range(len(categories)):
+            day_category_node = first_day_category_node + day_position * len(categories) + category_position
+            network.add_edge(day_category_node, day_node, 1)
+            network.add_edge(day_category_node, day_node, total_slots_needed, FLOW_RELAXATION_COST)
+        network.add_edge(day_node, sink, len(minutes_by_day[day]))
+    network.solve(source, sink)
+
+    slots_per_day = defaultdict(dict) # {position du jour: {index du besoin: nombre de créneaux}}
+    for need_index, day_position, edges in activity_edges:
+        slot_count = sum(network.flow_on(edge) for edge in edges)
+        if slot_count:
+            slots_per_day[day_position][need_index] = slot_count
+
+    # 3. Attribution des créneaux de chaque jour en alternant les activités
+    scheduled = [] # [(début en minutes, index du besoin)]
+    for day_position, day in enumerate(days):
+        remaining = slots_per_day.get(day_position, {})
+        last_need_index = None
+        last_end_minute = None
+        continuous_minutes = 0
+        for slot_start_minute in minutes_by_day[day]:
+            if slot_start_minute == last_end_minute and remaining.get(last_need_index, 0) > 0 and \
+                    continuous_minutes + slot_duration_minutes <= MAX_CONTINUOUS_MINUTES_PER_ACTIVITY:
+                need_index = last_need_index # Prolonger le bloc en cours
+                continuous_minutes += slot_duration_minutes
+            elif last_end_minute is not None and slot_start_minute < last_end_minute + MIN_GAP_MINUTES:
+                continue # Trop proche du bloc précédent : créneau laissé libre
+            else:
+                # L'activité ayant le plus de créneaux restants, différente de la précédente si possible
+                candidates = sorted((need_index for need_index, count in remaining.items() if count > 0),
+                                    key=lambda need_index: (need_index == last_need_index, -remaining[need_index], need_index))
+                if not candidates:
+                    break
+                need_index = candidates[0]
+                continuous_minutes = slot_duration_minutes
+            remaining[need_index] -= 1
+            scheduled.append((slot_start_minute, need_index))
+            last_need_index, last_end_minute = need_index, slot_start_minute + slot_duration_minutes
+
+    if contiguous_blocks:
+        # 4. Les créneaux d'une suite ne pouvant pas tous recevoir l'activité du bloc, compléter
+        #    les besoins restants dans tous les créneaux libres (comme la réparation incrémentale)
+        scheduled_activities, scheduled_minutes = repair_schedule(
+            activity_needs, slot_minutes, slot_days, slot_duration_minutes,
+            [(activity_needs[need_index]['activity'], slot_start_minute) for slot_start_minute, need_index in scheduled],
+            min_gap_minutes=MIN_GAP_MINUTES,
+            max_continuous_minutes=MAX_CONTINUOUS_MINUTES_PER_ACTIVITY,
+            contiguous_blocks=True
+        )
+    else:
+        scheduled_activities = []
+        scheduled_minutes = array('l')
+        for slot_start_minute, need_index in scheduled:
+            need = activity_needs[need_index]
+            need['slots_remaining'] -= 1
+            scheduled_activities.append(need['activity'])
+            scheduled_minutes.append(slot_start_minute)
+    for need in activity_needs:
+        if need['slots_remaining'] == 0:
+            print(f"Activité '{need['activity'].name}' entièrement planifiée.")
+    return scheduled_activities, scheduled_minutes
+
+
+def _available_slots(local_tz, week_start_utc, week_end_utc, slot_duration_minutes, buffered_busy, vectorized):
+    """
+    Créneaux disponibles de la semaine, en tableaux parallèles (ordre chronologique) :
+    début en minutes depuis le début de semaine et jour local (depuis le 1970-01-01).
+
+    Returns:
+        tuple: (array des débuts en minutes, array des jours locaux).
+    """
+    # 1. Créneaux possibles filtrés selon les heures de travail, de déjeuner locales ET le jour de la semaine.
+    #    Ne dépend que de la semaine, du fuseau et des constantes : modèle de semaine mis en cache.
+    slot_us = slot_duration_minutes * 60 * 1000000
+    week_start_us = to_epoch_us(week_start_utc)
+    slot_indices, slot_local_days = _week_template(
+        local_tz.zone, week_start_us, to_epoch_us(week_end_utc), slot_us,
+        WORKING_HOUR_START, WORKING_HOUR_END, LUNCH_START_HOUR, LUNCH_END_HOUR, vectorized
+    )
+
+    # 3. Marquer les créneaux occupés (en utilisant les périodes bufferisées et fusionnées)
+    if vectorized:
+        availability = _vectorized_availability(week_start_us, slot_us, slot_indices, buffered_busy).tolist()
+    else:
+        # Recherche dichotomique dans les périodes triées : O(S log B) au lieu de O(S x B)
+        availability = [
+            not buffered_busy.overlaps(week_start_us + slot_index * slot_us, week_start_us + (slot_index + 1) * slot_us)
+            for slot_index in slot_indices
+        ]
+
+    # Les datetimes ne sont créés qu'en sortie, pour les créneaux effectivement planifiés
+    slot_minutes = array('l')
+    slot_days = array('l')
+    for slot_index, slot_local_day, is_available in zip(slot_indices, slot_local_days, availability):
+        if is_available:
+            slot_minutes.append(slot_index * slot_duration_minutes)
+            slot_days.append(slot_local_day)
+    return slot_minutes, slot_days
+
+
+def schedule_digest(activities, busy_times_utc, week_start_utc, week_end_utc, local_tz_name=LOCAL_TZ_NAME, slot_duration_minutes=30, **options):
+    """
+    Empreinte SHA-256 de toutes les entrées dont dépend generate_schedule : activités (dans
+    l'ordre), périodes occupées fusionnées, bornes de la semaine, fuseau, durée des créneaux,
+    constantes du planificateur et options (engine, improve_budget_ms, ...).
+    Deux appels de même empreinte produisent le même planning.
+
+    Returns:
+        str: Empreinte hexadécimale.
+    """
+    busy = IntervalSet.coerce(busy_times_utc)
+    digest = hashlib.sha256()
+    digest.update(repr((
+        [(activity.id, activity.name, activity.weekly_minutes, activity.category) for activity in activities],
+        to_epoch_us(week_start_utc), to_epoch_us(week_end_utc), local_tz_name, slot_duration_minutes,
+        WORKING_HOUR_START, WORKING_HOUR_END, LUNCH_START_HOUR, LUNCH_END_HOUR,
+        MIN_GAP_MINUTES, MAX_CONTINUOUS_MINUTES_PER_ACTIVITY, BUSY_TIME_BUFFER_MINUTES,
+        FLOW_SPREAD_COST, FLOW_RELAXATION_COST, SCHEDULER_REVISION, sorted(options.items())
+    )).encode('utf-8'))
+    digest.update(busy.starts.tobytes())
+    digest.update(busy.ends.tobytes())
+    return digest.hexdigest()
+
+
+def _week_bounds(local_tz, week_start_utc, week_end_utc, weeks):
+    """
+    Bornes UTC de weeks semaines consécutives : mêmes heures locales de début et de fin que
+    la première semaine, décalées de 7 jours (les changements d'heure sont donc respectés).
+    """
+    bounds = [(week_start_utc, week_end_utc)]
+    start_local = week_start_utc.astimezone(local_tz).replace(tzinfo=None)
+    end_local = week_end_utc.astimezone(local_tz).replace(tzinfo=None)
+    for week_index in range(1, weeks):
+        shift = timedelta(weeks=week_index)
+        bounds.append((local_tz.localize(start_local + shift).astimezone(pytz.utc),
+                       local_tz.localize(end_local + shift).astimezone(pytz.utc)))
+    return bounds
+
+
+def generate_schedule(activities, busy_times_utc, week_start_utc, week_end_utc, local_tz_name=LOCAL_TZ_NAME, slot_duration_minutes=30, vectorized=False, engine='greedy',
+                      improve_budget_ms=0, improve_seed=0, state=None, weeks=1, contiguous_blocks=False):
+    """
+    Répartit les activités dans les créneaux disponibles d'une semaine (ou de plusieurs
+    semaines consécutives), en respectant les heures de travail, les contraintes de
+    catégorie/jour, l'espacement et la durée maximale par bloc.
+
+    Args:
+        activities (list): Liste d'objets Activity.
+        busy_times_utc (list | IntervalSet): Périodes occupées, en tuples (start_utc, end_utc) ou en IntervalSet,
+                                             sur toute la période planifiée.
+        week_start_utc (datetime): Début de la (première) semaine en UTC.
+        week_end_utc (datetime): Fin de la (première) semaine en UTC.
+        local_tz_name (str): Nom du fuseau horaire local (ex: 'Europe/Paris').
+        slot_duration_minutes (int): Durée de chaque créneau.
+        vectorized (bool): Construire la grille de créneaux et les masques de disponibilité
+                           avec NumPy (si installé), utile pour les longues périodes.
+        engine (str): Moteur de placement : 'greedy' (round-robin glouton) ou 'flow'
+                      (flot à coût minimum : même temps planifié que 'greedy' sans
+                      contiguous_blocks, moins de relaxations de catégorie ; voir
+                      benchmarks/bench_engines.py).
+        improve_budget_ms (float): Budget (en ms) de la recherche locale qui améliore le
+                                   planning obtenu ; 0 pour la désactiver.
+        improve_seed (int): Graine de la recherche locale (résultat déterministe).
+        state (dict): Planning précédent, mis à jour à chaque appel. Chaque semaine déjà
+                      planifiée au dernier appel est réparée (seuls les créneaux des activités
+                      ajoutées, supprimées ou modifiées changent) au lieu d'être recalculée.
+        weeks (int): Nombre de semaines consécutives à planifier à partir de week_start_utc.
+                     Le temps hebdomadaire des activités est réparti dans chaque semaine.
+        contiguous_blocks (bool): Autoriser les blocs de créneaux contigus d'une même activité
+                                  (jusqu'à MAX_CONTINUOUS_MINUTES_PER_ACTIVITY), sans espacement
+                                  minimum entre eux ; tous les moteurs, la recherche locale et la
+                                  réparation incrémentale respectent cette option.
+
+    Returns:
+        list: Liste de dictionnaires d'événements planifiés.
+    """
+    buffer_duration = timedelta(minutes=BUSY_TIME_BUFFER_MINUTES) # Buffer duration
+
+    try:
+        local_tz = pytz.timezone(local_tz_name)
+    except pytz.UnknownTimeZoneError:
+        print(f"Erreur: Fuseau horaire '{local_tz_name}' inconnu. Utilisation de UTC.")
+        local_tz = pytz.utc # Fallback to UTC
+
+    if engine not in SCHEDULER_ENGINES:
+        print(f"Avertissement: Moteur de placement '{engine}' inconnu. Utilisation de 'greedy'.")
+        engine = 'greedy'
+
+    if vectorized and np is None:
+        print("Avertissement: NumPy n'est pas installé, utilisation du moteur de créneaux standard.")
+        vectorized = False
+
+    if not any(round(activity.weekly_minutes / slot_duration_minutes) > 0 for activity in activities):
+        print("Aucune activité à planifier.")
+        if state is not None:
+            state.clear()
+        return []
+
+    # 2. Appliquer le buffer aux périodes occupées externes et les fusionner
+    #    (élargir de buffer_duration de chaque côté), une seule fois pour toute la période ;
+    #    chaque semaine n'en garde que sa partie (recherche dichotomique).
+    buffered_busy_all = IntervalSet.coerce(busy_times_utc).dilate(buffer_duration)
+
+    scheduled_events_final = []
+    week_states = {}
+    for week_index, (current_week_start_utc, current_week_end_utc) in enumerate(_week_bounds(local_tz, week_start_utc, week_end_utc, weeks)):
+        if weeks > 1:
+            print(f"Semaine {week_index + 1}/{weeks} (début {current_week_start_utc.strftime('%Y-%m-%d %H:%M %Z')}):")
+        # Planning précédent de cette semaine, indexé par son début
+        week_key = to_epoch_us(current_week_start_utc)
+        week_state = state.get(week_key, {}) if state is not None else None
+        scheduled_events_final.extend(_schedule_week(
+            activities, buffered_busy_all.clip(current_week_start_utc, current_week_end_utc),
+            current_week_start_utc, current_week_end_utc, local_tz, slot_duration_minutes,
+            vectorized, engine, improve_budget_ms, improve_seed, contiguous_blocks, week_state
+        ))
+        if week_state is not None:
+            week_states[week_key] = week_state
+
+    if state is not None:
+        # Ne garder que les semaines de la période courante
+        state.clear()
+        state.update(week_states)
+    return scheduled_events_final
+
+
+def _schedule_week(activities, buffered_busy, week_start_utc, week_end_utc, local_tz, slot_duration_minutes,
+                   vectorized, engine, improve_budget_ms, improve_seed, contiguous_blocks, state):
+    """
+    Planifie une semaine (voir generate_schedule) à partir des périodes occupées déjà
+    élargies du buffer et tronquées à la semaine.
+
+    Args:
+        state (dict): Planning précédent de cette semaine (vide au premier appel), mis à jour ; ou None.
+
+    Returns:
+        list: Liste de dictionnaires d'événements planifiés.
+    """
+    scheduled_events_final = []
+    slot_duration = timedelta(minutes=slot_duration_minutes)
+
+    # Réparation incrémentale si state contient le planning précédent de la même semaine
+    state_key = (local_tz.zone, to_epoch_us(week_start_utc), to_epoch_us(week_end_utc), slot_duration_minutes, contiguous_blocks)
+    previous_state = state if state and state.get('key') == state_key else None
+
+    if previous_state is not None and previous_state['buffered_busy'] == buffered_busy:
+        # Périodes occupées inchangées : réutiliser le masque de disponibilité précédent
+        slot_minutes, slot_days = previous_state['slot_minutes'], previous_state['slot_days']
+    else:
+        # 1 + 3. Créneaux éligibles (modèle de semaine en cache) non couverts par une période occupée
+        slot_minutes, slot_days = _available_slots(
+            local_tz, week_start_utc, week_end_utc, slot_duration_minutes, buffered_busy, vectorized
+        )
+
+    current_trace().count('slots_available', len(slot_minutes))
+
+    # 4. Préparer les besoins en temps pour chaque activité (Renumbered from 3)
+    activity_needs = []
+    for activity in activities:
+        slots_needed = round(activity.weekly_minutes / slot_duration_minutes)
+        if slots_needed > 0:
+            activity_needs.append({
+                'activity': activity,
+                'slots_remaining': slots_needed,
+            })
+
+    # 5. Placement des activités dans les créneaux disponibles
+    #    Les instants et durées sont des minutes depuis le début de semaine.
+    if previous_state is not None:
+        # Conserver les créneaux précédents encore valides, ne placer que les besoins modifiés
+        activities_by_id = {need['activity'].id: need['activity'] for need in activity_needs}
+        previous_assignments = [(activities_by_id[activity_id], minute)
+                                for activity_id, minute in previous_state['assignments'] if activity_id in activities_by_id]
+        scheduled_activities, scheduled_minutes = repair_schedule(
+            activity_needs, slot_minutes, slot_days, slot_duration_minutes, previous_assignments,
+            min_gap_minutes=MIN_GAP_MINUTES,
+            max_continuous_minutes=MAX_CONTINUOUS_MINUTES_PER_ACTIVITY,
+            contiguous_blocks=contiguous_blocks
+        )
+    elif engine == 'flow':
+        scheduled_activities, scheduled_minutes = _flow_placement(
+            activity_needs, slot_minutes, slot_days, slot_duration_minutes, contiguous_blocks
+        )
+    else:
+        scheduled_activities, scheduled_minutes = _greedy_placement(
+            activity_needs, slot_minutes, slot_days, slot_duration_minutes, week_start_utc, local_tz, contiguous_blocks
+        )
+
+    # 5.1 Amélioration optionnelle par recherche locale, dans un budget de temps borné
+    #     (pas en mode incrémental, qui doit laisser les créneaux inchangés en place)
+    if improve_budget_ms and previous_state is None:
+        scheduled_activities, scheduled_minutes = improve_schedule(
+            activity_needs, slot_minutes, slot_days, slot_duration_minutes,
+            scheduled_activities, scheduled_minutes,
+            min_gap_minutes=MIN_GAP_MINUTES,
+            max_continuous_minutes=MAX_CONTINUOUS_MINUTES_PER_ACTIVITY,
+            contiguous_blocks=contiguous_blocks,
+            budget_ms=improve_budget_ms,
+            seed=improve_seed
+        )
 
     # 6. Générer la liste finale d'événements et afficher les avertissements (Renumbered from 5)
-    for detail in scheduled_slots_details:
-        activity = detail['activity']
-        slot = detail['slot']
+    #    Seule étape qui crée des datetimes : un par borne de créneau planifié.
+    for activity, slot_start_minute in zip(scheduled_activities, scheduled_minutes):
+        slot_start_utc = week_start_utc + timedelta(minutes=slot_start_minute)
         scheduled_events_final.append({
             'name': activity.name,
             'category': activity.category,
-            'start_utc': slot['start'],
-            'end_utc': slot['end']
+            'start_utc': slot_start_utc,
+            'end_utc': slot_start_utc + slot_duration,
+            'activity_id': activity.id
         })
 
+    if state is not None:
+        state.clear()
+        state.update({
+            'key': state_key,
+            'buffered_busy': buffered_busy,
+            'slot_minutes': slot_minutes,
+            'slot_days': slot_days,
+            'assignments': [(activity.id, minute) for activity, minute in zip(scheduled_activities, scheduled_minutes)],
+        })
+
+    current_trace().count('slots_generated', len(scheduled_events_final))
     print(f"Planification terminée. {len(scheduled_events_final)} créneaux planifiés.")
     # Afficher les avertissements pour les activités non entièrement planifiées
-    if activity_needs:
+    unscheduled_needs = [need for need in activity_needs if need['slots_remaining'] > 0]
+    if unscheduled_needs:
         print("-" * 20)
         print("AVERTISSEMENT: Toutes les activités n'ont pas pu être entièrement planifiées :")
-        for need in activity_needs:
+        for need in unscheduled_needs:
             activity = need['activity']
             minutes_missing = need['slots_remaining'] * slot_duration_minutes
             print(f"  - '{activity.name}': {minutes_missing} minutes ({need['slots_remaining']} créneaux) manquantes. "
@@ -281,4 +719,33 @@ def generate_schedule(activities, busy_times_utc, week_start_utc, week_end_utc,
 
     return scheduled_events_final
 
+
+def coalesce_events(scheduled_events):
+    """
+    Fusionne les créneaux consécutifs d'une même activité en un seul événement
+    (un bloc de 2 h devient un événement au lieu de quatre créneaux de 30 min).
+
+    Étape de sortie, appliquée juste avant la sérialisation : le planning produit par
+    generate_schedule (et mis en cache) reste découpé en créneaux.
+
+    Args:
+        scheduled_events (list): Événements retournés par generate_schedule.
+
+    Returns:
+        list: Nouveaux dictionnaires d'événements, triés par début ; chaque bloc garde le
+              début de son premier créneau et la fin de son dernier.
+    """
+    coalesced = []
+    open_blocks = {} # {activité: dernier événement fusionné}, pour prolonger le bloc en cours
+    for event in sorted(scheduled_events, key=lambda event: event['start_utc']):
+        activity_key = (event.get('activity_id'), event['name'], event.get('category'))
+        block = open_blocks.get(activity_key)
+        if block is not None and block['end_utc'] == event['start_utc']:
+            block['end_utc'] = event['end_utc']
+            continue
+        block = dict(event)
+        open_blocks[activity_key] = block
+        coalesced.append(block)
+    return coalesced
+
 # --- Fin de scheduler.py ---
\ No newline at end of file
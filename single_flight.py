@@ -0,0 +1,182 @@
+import os
+import time
+import hashlib
+import threading
+from calendar_utils import atomic_write
+
+try:
+    import fcntl # Verrous de fichiers POSIX
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt # Verrous de fichiers Windows
+except ImportError:
+    msvcrt = None
+
+# Les résultats partagés entre processus plus anciens que ce délai sont supprimés
+RESULT_MAX_AGE_SECONDS = 300
+
+
+def _lock_file(lock_file):
+    """Verrou exclusif (bloquant) sur un fichier ouvert."""
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        return
+    lock_file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue # LK_LOCK abandonne après une dizaine de secondes d'attente : réessayer
+
+
+def _unlock_file(lock_file):
+    """Libère le verrou posé par _lock_file."""
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        return
+    lock_file.seek(0)
+    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _acquire_lock_file(lock_path):
+    """
+    Ouvre (ou crée) lock_path et y pose un verrou exclusif. Si le détenteur précédent a
+    supprimé le fichier pendant l'attente, le verrou obtenu porte sur un fichier orphelin :
+    recommencer avec le fichier courant.
+
+    Returns:
+        file: Le fichier verrouillé, à libérer avec _unlock_file.
+    """
+    while True:
+        lock_file = open(lock_path, 'a+b')
+        _lock_file(lock_file)
+        try:
+            if os.path.samestat(os.fstat(lock_file.fileno()), os.stat(lock_path)):
+                return lock_file
+        except FileNotFoundError:
+            pass
+        _unlock_file(lock_file)
+        lock_file.close()
+
+
+class SingleFlight:
+    """
+    Regroupe les calculs identiques simultanés : pour une même clé, un seul appelant (le
+    « meneur ») exécute le calcul, les autres attendent et reçoivent son résultat.
+
+    Entre threads d'un même processus, les appelants attendent le meneur en mémoire.
+    Entre processus (workers gunicorn), si lock_dir est fourni, un verrou de fichier par clé
+    sérialise les calculs : un processus qui obtient le verrou après un autre relit le
+    résultat que celui-ci a écrit pendant son attente au lieu de recalculer. Sans module de
+    verrouillage (ni fcntl, ni msvcrt), seul le regroupement entre threads est actif.
+    """
+
+    def __init__(self, lock_dir=None, dumps=None, loads=None):
+        """
+        Args:
+            lock_dir (str): Répertoire des verrous et résultats partagés entre processus
+                            (None pour ne regrouper qu'entre threads).
+            dumps (callable): Sérialise un résultat en bytes (requis avec lock_dir).
+            loads (callable): Reconstruit un résultat sérialisé par dumps.
+        """
+        if lock_dir and fcntl is None and msvcrt is None:
+            print("Avertissement: Verrous de fichiers indisponibles, regroupement des calculs limité aux threads.")
+            lock_dir = None
+        self.lock_dir = lock_dir
+        self.dumps = dumps
+        self.loads = loads
+        self._calls = {} # {clé: calcul en cours}
+        self._lock = threading.Lock()
+
+    def do(self, key, compute):
+        """
+        Exécute compute() pour key, ou attend le calcul identique déjà en cours.
+
+        Returns:
+            tuple: (résultat, True si le résultat vient du calcul d'un autre appelant).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+
+        if not is_leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], True
+
+        shared = False
+        try:
+            call['result'], shared = self._do_across_processes(key, compute)
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            # Les appelants arrivés après la fin du calcul en lancent un nouveau
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+        return call['result'], shared
+
+    def _do_across_processes(self, key, compute):
+        """Exécute compute() sous le verrou de fichier de key, ou relit le résultat d'un autre processus."""
+        if self.lock_dir is None:
+            return compute(), False
+
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        lock_path = os.path.join(self.lock_dir, f"{name}.lock")
+        result_path = os.path.join(self.lock_dir, f"{name}.result")
+        requested_at = time.time()
+        try:
+            os.makedirs(self.lock_dir, exist_ok=True)
+            lock_file = _acquire_lock_file(lock_path)
+        except OSError as e:
+            print(f"Avertissement: Verrou '{lock_path}' indisponible ({e}), calcul sans regroupement entre processus.")
+            return compute(), False
+
+        with lock_file:
+            try:
+                # Résultat écrit pendant notre attente : le calcul était en cours à notre arrivée
+                try:
+                    if os.path.getmtime(result_path) >= requested_at:
+                        with open(result_path, 'rb') as result_file:
+                            return self.loads(result_file.read()), True
+                except (OSError, ValueError):
+                    pass # Pas de résultat récent lisible : calculer
+
+                result = compute()
+                try:
+                    atomic_write(result_path, self.dumps(result))
+                    self._prune_files()
+                except OSError as e:
+                    print(f"Avertissement: Écriture du résultat partagé '{result_path}' impossible: {e}")
+                return result, False
+            finally:
+                # Supprimer le verrou avant de le libérer : les processus qui attendent sur ce
+                # fichier le détectent (_acquire_lock_file) et en recréent un, aucun fichier ne reste
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass # Déjà supprimé, ou fichier ouvert impossible à supprimer (Windows)
+                _unlock_file(lock_file)
+
+    def _prune_files(self):
+        """
+        Supprime les résultats partagés (et les verrous abandonnés) plus anciens que
+        RESULT_MAX_AGE_SECONDS : un résultat ne sert qu'aux processus qui attendaient son calcul.
+        """
+        expired_before = time.time() - RESULT_MAX_AGE_SECONDS
+        for entry in os.scandir(self.lock_dir):
+            if entry.name.endswith(('.result', '.lock')):
+                try:
+                    if entry.stat().st_mtime < expired_before:
+                        os.remove(entry.path)
+                except OSError:
+                    pass # Supprimé entre-temps par un autre processus
+
+# --- Fin de single_flight.py ---
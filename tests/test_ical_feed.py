@@ -0,0 +1,83 @@
+import random
+import re
+import unittest
+from datetime import datetime, timedelta
+
+import pytz
+from icalendar import Calendar, Event
+
+from calendar_utils import create_ical_feed
+
+SEED = 20
+EVENTS_PER_TIMEZONE = 250
+TIMEZONES = ('Europe/Paris', 'UTC', 'America/New_York', 'Etc/GMT+3', 'Asia/Kolkata', 'Australia/Lord_Howe')
+NAMES = (
+    'Sport', 'Lecture, roman; chapitre 3', 'Chemin C:\\temp\\notes', 'Première ligne\nseconde ligne',
+    'Répétition générale — théâtre « Le Cid »', '日本語の勉強と漢字の練習', 'Émoji 🎹 piano',
+    'Un nom très long qui dépasse largement les soixante-quinze octets autorisés par ligne de contenu',
+    'ééééééééééééééééééééééééééééééééééééééééééééééééééééééééééééééé',
+)
+CATEGORIES = ('sport', 'loisir', 'travail, étude', 'caté;gorie\\spéciale')
+_DTSTAMP_LINE = re.compile(rb'^DTSTAMP:[0-9TZ]+\r\n', re.MULTILINE)
+
+
+def _icalendar_feed(scheduled_events, target_tz):
+    """Flux construit avec les objets icalendar, comme create_ical_feed avant la sérialisation directe."""
+    cal = Calendar()
+    cal.add('prodid', '-//Mon Planificateur Personnel//mxm.dk//')
+    cal.add('version', '2.0')
+    cal.add('calscale', 'GREGORIAN')
+    cal.add('method', 'PUBLISH')
+    timezone = pytz.timezone(target_tz)
+    for event_data in scheduled_events:
+        event = Event()
+        event.add('summary', event_data['name'])
+        event.add('dtstart', event_data['start_utc'].astimezone(timezone))
+        event.add('dtend', event_data['end_utc'].astimezone(timezone))
+        event.add('dtstamp', datetime.now(pytz.utc))
+        event.add('uid', f"{event_data['start_utc'].strftime('%Y%m%dT%H%M%SZ')}-{event_data['name']}@monplanificateur.perso")
+        if 'category' in event_data:
+            event.add('categories', [event_data['category']])
+        cal.add_component(event)
+    return cal.to_ical()
+
+
+def _random_events(rng, count):
+    """Événements aléatoires sur un an (dont les changements d'heure), avec ou sans catégorie."""
+    events = []
+    for _ in range(count):
+        start_utc = datetime(2026, 1, 1, tzinfo=pytz.utc) + timedelta(minutes=15 * rng.randrange(365 * 96))
+        event = {'name': rng.choice(NAMES), 'start_utc': start_utc,
+                 'end_utc': start_utc + timedelta(minutes=rng.choice([15, 30, 60, 120]))}
+        if rng.random() < 0.9:
+            event['category'] = rng.choice(CATEGORIES)
+        events.append(event)
+    return events
+
+
+class IcalFeedCompatibilityTest(unittest.TestCase):
+    """Le flux sérialisé directement est identique, octet pour octet, à celui d'icalendar (hors DTSTAMP)."""
+
+    def test_matches_icalendar_feed(self):
+        rng = random.Random(SEED)
+        for target_tz in TIMEZONES:
+            events = _random_events(rng, EVENTS_PER_TIMEZONE)
+            expected = _DTSTAMP_LINE.sub(b'', _icalendar_feed(events, target_tz))
+            self.assertEqual(_DTSTAMP_LINE.sub(b'', create_ical_feed(events, target_tz=target_tz)), expected, target_tz)
+
+    def test_stream_matches_full_content(self):
+        events = _random_events(random.Random(SEED), EVENTS_PER_TIMEZONE)
+        for include_vtimezone in (False, True):
+            content = create_ical_feed(events, target_tz='Europe/Paris', include_vtimezone=include_vtimezone)
+            chunks = create_ical_feed(events, target_tz='Europe/Paris', include_vtimezone=include_vtimezone, stream=True)
+            self.assertEqual(_DTSTAMP_LINE.sub(b'', b''.join(chunks)), _DTSTAMP_LINE.sub(b'', content))
+
+    def test_empty_feed(self):
+        self.assertEqual(_DTSTAMP_LINE.sub(b'', create_ical_feed([], target_tz='Europe/Paris')),
+                         _icalendar_feed([], 'Europe/Paris'))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# --- Fin de test_ical_feed.py ---
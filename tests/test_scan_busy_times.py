@@ -0,0 +1,141 @@
+import random
+import unittest
+from datetime import date, datetime, timedelta
+
+import pytz
+
+from calendar_utils import parse_busy_times, scan_busy_times
+
+SEED = 5
+RANDOM_SPLITS = 20 # Découpages aléatoires par calendrier
+RANDOM_EVENTS = 150
+TIMEZONES = ('Europe/Paris', 'UTC', 'America/New_York')
+WINDOWS = ((date(2026, 3, 23), date(2026, 3, 29)), (date(2026, 10, 19), date(2026, 11, 1)))
+
+# Fuseau personnalisé (TZID hors base Olson) : UTC+1 l'hiver, UTC+2 l'été, règles européennes
+CUSTOM_VTIMEZONE = (
+    "BEGIN:VTIMEZONE\r\n"
+    "TZID:Fuseau Personnalisé Test\r\n"
+    "BEGIN:STANDARD\r\n"
+    "DTSTART:19701025T030000\r\n"
+    "RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU\r\n"
+    "TZOFFSETFROM:+0200\r\n"
+    "TZOFFSETTO:+0100\r\n"
+    "END:STANDARD\r\n"
+    "BEGIN:DAYLIGHT\r\n"
+    "DTSTART:19700329T020000\r\n"
+    "RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU\r\n"
+    "TZOFFSETFROM:+0100\r\n"
+    "TZOFFSETTO:+0200\r\n"
+    "END:DAYLIGHT\r\n"
+    "END:VTIMEZONE\r\n"
+)
+
+FIXED_EVENTS = (
+    # Lignes pliées (espace et tabulation), y compris au milieu du paramètre TZID et de la valeur
+    "BEGIN:VEVENT\r\nUID:plie@test\r\nSUMMARY:Un résumé assez long pour être plié sur plusieurs lignes de\r\n  contenu\r\n"
+    "DTSTART;TZID=Fuseau \r\n Personnalisé Test:20260324T0\r\n\t93000\r\n"
+    "DTEND;TZID=Fuseau Personnalisé Test:202603\r\n 24T113000\r\nEND:VEVENT\r\n",
+    # Fuseau personnalisé pendant le changement d'heure (heure inexistante le 29 mars)
+    "BEGIN:VEVENT\r\nUID:perso@test\r\nDTSTART;TZID=Fuseau Personnalisé Test:20260329T013000\r\n"
+    "DTEND;TZID=Fuseau Personnalisé Test:20260329T043000\r\nEND:VEVENT\r\n",
+    "BEGIN:VEVENT\r\nUID:perso-octobre@test\r\nDTSTART;TZID=Fuseau Personnalisé Test:20261025T020000\r\n"
+    "DTEND;TZID=Fuseau Personnalisé Test:20261025T060000\r\nEND:VEVENT\r\n",
+    # Événements « journée entière » (VALUE=DATE), sur un et plusieurs jours
+    "BEGIN:VEVENT\r\nUID:jour@test\r\nDTSTART;VALUE=DATE:20260325\r\nDTEND;VALUE=DATE:20260326\r\nEND:VEVENT\r\n",
+    "BEGIN:VEVENT\r\nUID:jours@test\r\nDTSTART;VALUE=DATE:20261030\r\nDTEND;VALUE=DATE:20261103\r\nEND:VEVENT\r\n",
+    # VALARM imbriquées, avant et après DTEND ; le DTEND de la seconde ne concerne pas le VEVENT
+    "BEGIN:VEVENT\r\nUID:alarme@test\r\nDTSTART:20260326T140000Z\r\n"
+    "BEGIN:VALARM\r\nACTION:DISPLAY\r\nDESCRIPTION:Rappel\r\nTRIGGER;VALUE=DATE-TIME:20260101T000000Z\r\nEND:VALARM\r\n"
+    "DTEND:20260326T150000Z\r\n"
+    "BEGIN:VALARM\r\nACTION:AUDIO\r\nTRIGGER:-PT15M\r\nDTEND:20260326T220000Z\r\nEND:VALARM\r\nEND:VEVENT\r\n",
+    # DTSTART et DURATION, sans DTEND : ignoré par les deux parseurs
+    "BEGIN:VEVENT\r\nUID:duree@test\r\nDTSTART:20260327T080000Z\r\nDURATION:PT2H\r\nEND:VEVENT\r\n",
+    # Heures flottantes, fuseau Olson, UTC et événement hors fenêtre
+    "BEGIN:VEVENT\r\nUID:flottant@test\r\nDTSTART:20261020T100000\r\nDTEND:20261020T120000\r\nEND:VEVENT\r\n",
+    "BEGIN:VEVENT\r\nUID:olson@test\r\nDTSTART;TZID=America/New_York:20261101T013000\r\n"
+    "DTEND;TZID=America/New_York:20261101T033000\r\nEND:VEVENT\r\n",
+    "BEGIN:VEVENT\r\nUID:loin@test\r\nDTSTART:20250101T100000Z\r\nDTEND:20250101T110000Z\r\nEND:VEVENT\r\n",
+)
+
+
+def _random_events(rng):
+    """Événements aléatoires autour des fenêtres testées, en UTC, heure flottante ou fuseau personnalisé."""
+    events = []
+    for index in range(RANDOM_EVENTS):
+        start = datetime(2026, 3, 16) + timedelta(minutes=30 * rng.randrange(240 * 48))
+        end = start + timedelta(minutes=rng.choice([30, 60, 120, 600]))
+        form = rng.choice(['Z', '', ';TZID=Fuseau Personnalisé Test', ';TZID=Europe/Paris'])
+        suffix = 'Z' if form == 'Z' else ''
+        params = '' if form == 'Z' else form
+        events.append(
+            f"BEGIN:VEVENT\r\nUID:{index}@test\r\nSUMMARY:Événement {index}\r\n"
+            f"DTSTART{params}:{start:%Y%m%dT%H%M%S}{suffix}\r\nDTEND{params}:{end:%Y%m%dT%H%M%S}{suffix}\r\nEND:VEVENT\r\n"
+        )
+    return events
+
+
+def _calendar(rng, random_events=True):
+    """Calendrier complet : VTIMEZONE personnalisé, événements fixes et (par défaut) aléatoires mélangés."""
+    events = list(FIXED_EVENTS) + (_random_events(rng) if random_events else [])
+    rng.shuffle(events)
+    body = "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Test//FR\r\n" + CUSTOM_VTIMEZONE + "".join(events) + "END:VCALENDAR\r\n"
+    return body.encode('utf-8')
+
+
+def _chunks(content, sizes):
+    """Découpe content en morceaux successifs de tailles données (cycliquement)."""
+    position = index = 0
+    while position < len(content):
+        size = sizes[index % len(sizes)]
+        yield content[position:position + size]
+        position += size
+        index += 1
+
+
+class ScanBusyTimesTest(unittest.TestCase):
+    """Différentiel : parseur en flux (scan_busy_times) contre le parseur complet, quel que soit le découpage."""
+
+    def _check(self, content, splits):
+        for target_tz in TIMEZONES:
+            for start_date, end_date in WINDOWS:
+                expected = parse_busy_times(content, start_date, end_date, target_tz=target_tz)
+                self.assertTrue(expected)
+                for sizes in splits:
+                    scanned = scan_busy_times(_chunks(content, sizes), start_date, end_date, target_tz=target_tz)
+                    self.assertEqual(scanned, expected, (target_tz, start_date, sizes[:5]))
+
+    def test_fixed_chunk_sizes(self):
+        content = _calendar(random.Random(SEED))
+        self._check(content, [[len(content)], [1], [2], [3], [7], [64], [4096]])
+
+    def test_random_chunk_boundaries(self):
+        rng = random.Random(SEED)
+        content = _calendar(rng)
+        self._check(content, [[rng.randint(1, 200) for _ in range(50)] for _ in range(RANDOM_SPLITS)])
+
+    def test_lf_line_endings(self):
+        content = _calendar(random.Random(SEED)).replace(b'\r\n', b'\n')
+        self._check(content, [[1], [5, 11, 3]])
+
+    def test_fixed_events_only(self):
+        content = _calendar(random.Random(SEED), random_events=False)
+        self._check(content, [[len(content)], [1], [13]])
+        start_date, end_date = WINDOWS[0]
+        busy = scan_busy_times(_chunks(content, [1]), start_date, end_date, target_tz='UTC')
+
+        def is_busy(*args):
+            instant = pytz.utc.localize(datetime(*args))
+            return any(start <= instant < end for start, end in busy)
+
+        self.assertTrue(is_busy(2026, 3, 24, 8, 30)) # Lignes pliées, fuseau personnalisé (UTC+1)
+        self.assertTrue(is_busy(2026, 3, 25, 12)) # Journée entière (VALUE=DATE)
+        self.assertTrue(is_busy(2026, 3, 26, 14, 30)) # DTEND après une VALARM imbriquée
+        self.assertFalse(is_busy(2026, 3, 26, 18)) # DTEND interne à la VALARM : ignoré
+        self.assertFalse(is_busy(2026, 3, 27, 9)) # DURATION sans DTEND : ignoré
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# --- Fin de test_scan_busy_times.py ---
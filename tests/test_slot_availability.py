@@ -0,0 +1,90 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+import pytz
+
+import scheduler
+from intervals import IntervalSet, to_epoch_us
+
+CASES = 300 # Semaines aléatoires par test
+SEED = 9
+
+
+def _naive_available_slots(local_tz, week_start_utc, week_end_utc, slot_duration_minutes, busy_pairs):
+    """
+    Ancien marquage des créneaux (étape 3 avant la recherche dichotomique) : chaque période
+    occupée comparée à chaque créneau éligible, O(B x S), sur les périodes non fusionnées.
+    """
+    slot_us = slot_duration_minutes * 60 * 1000000
+    week_start_us = to_epoch_us(week_start_utc)
+    slot_indices, slot_local_days = scheduler._week_template(
+        local_tz.zone, week_start_us, to_epoch_us(week_end_utc), slot_us,
+        scheduler.WORKING_HOUR_START, scheduler.WORKING_HOUR_END,
+        scheduler.LUNCH_START_HOUR, scheduler.LUNCH_END_HOUR, False
+    )
+    all_slots = [
+        {'start': week_start_us + slot_index * slot_us, 'end': week_start_us + (slot_index + 1) * slot_us,
+         'minute': slot_index * slot_duration_minutes, 'day': slot_local_day, 'available': True}
+        for slot_index, slot_local_day in zip(slot_indices, slot_local_days)
+    ]
+    for busy_start, busy_end in busy_pairs:
+        for slot in all_slots:
+            if slot['start'] < busy_end and slot['end'] > busy_start:
+                slot['available'] = False
+    available = [slot for slot in all_slots if slot['available']]
+    return [slot['minute'] for slot in available], [slot['day'] for slot in available]
+
+
+def _random_week(rng):
+    """Semaine aléatoire (dont des semaines de changement d'heure) et périodes occupées dilatées."""
+    local_tz = pytz.timezone(rng.choice(['Europe/Paris', 'UTC', 'America/New_York']))
+    day = rng.choice([datetime(2026, 1, 5) + timedelta(weeks=rng.randrange(60)),
+                      datetime(2026, 3, 23), datetime(2026, 10, 19)])
+    week_start_utc = local_tz.localize(day).astimezone(pytz.utc)
+    week_end_utc = local_tz.localize(day + timedelta(days=7)).astimezone(pytz.utc)
+    buffer_us = scheduler.BUSY_TIME_BUFFER_MINUTES * 60 * 1000000
+    busy_pairs = []
+    for _ in range(rng.randrange(60)):
+        start_us = to_epoch_us(week_start_utc) + rng.randrange(-600, 7 * 24 * 60 + 600) * 60 * 1000000
+        end_us = start_us + rng.choice([0, 15, 30, 45, 60, 90, 240]) * 60 * 1000000
+        busy_pairs.append((start_us - buffer_us, end_us + buffer_us))
+    return local_tz, week_start_utc, week_end_utc, rng.choice([5, 15, 30, 60]), busy_pairs
+
+
+class SlotAvailabilityTest(unittest.TestCase):
+    """Différentiel : marquage dichotomique (IntervalSet) contre l'ancien filtre par listes."""
+
+    def _check(self, vectorized):
+        rng = random.Random(SEED)
+        for case in range(CASES):
+            local_tz, week_start_utc, week_end_utc, slot_duration_minutes, busy_pairs = _random_week(rng)
+            slot_minutes, slot_days = scheduler._available_slots(
+                local_tz, week_start_utc, week_end_utc, slot_duration_minutes,
+                IntervalSet.from_pairs(busy_pairs), vectorized
+            )
+            expected = _naive_available_slots(local_tz, week_start_utc, week_end_utc, slot_duration_minutes, busy_pairs)
+            self.assertEqual((list(slot_minutes), list(slot_days)), expected, f"cas {case}")
+
+    def test_bisect_matches_naive_filter(self):
+        self._check(vectorized=False)
+
+    @unittest.skipIf(scheduler.np is None, "NumPy n'est pas installé")
+    def test_vectorized_matches_naive_filter(self):
+        self._check(vectorized=True)
+
+    def test_overlaps_matches_naive_scan(self):
+        rng = random.Random(SEED)
+        for _ in range(CASES * 10):
+            pairs = [(start, start + rng.randint(0, 8)) for start in (rng.randint(0, 100) for _ in range(rng.randint(0, 10)))]
+            busy = IntervalSet.from_pairs(pairs)
+            start = rng.randint(-5, 110)
+            end = start + rng.randint(1, 10)
+            expected = any(pair_start < end and pair_end > start for pair_start, pair_end in pairs if pair_start < pair_end)
+            self.assertEqual(busy.overlaps(start, end), expected, (pairs, start, end))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# --- Fin de test_slot_availability.py ---
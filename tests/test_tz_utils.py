@@ -0,0 +1,63 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+import pytz
+
+from intervals import to_epoch_us
+from tz_utils import OffsetTable
+
+SEED = 11
+STEP_MINUTES = 15 # Pas de balayage des semaines de changement d'heure
+TIMEZONES = ('Europe/Paris', 'Europe/London', 'America/New_York', 'Australia/Sydney', 'Asia/Kolkata', 'UTC')
+# Semaines (lundi local) de mars et d'octobre/novembre 2026 : changements d'heure européens
+# (29 mars, 25 octobre), américains (8 mars, 1er novembre) et australiens (5 avril, 4 octobre)
+DST_WEEKS = (datetime(2026, 3, 2), datetime(2026, 3, 23), datetime(2026, 3, 30),
+             datetime(2026, 9, 28), datetime(2026, 10, 19), datetime(2026, 10, 26))
+
+
+def _weeks():
+    """(fuseau, lundi local, table de la semaine) pour chaque fuseau et chaque semaine testée."""
+    for tz_name in TIMEZONES:
+        tz = pytz.timezone(tz_name)
+        for monday in DST_WEEKS:
+            week_start_utc = tz.localize(monday).astimezone(pytz.utc)
+            week_end_utc = tz.localize(monday + timedelta(days=7)).astimezone(pytz.utc)
+            yield tz, monday, week_start_utc, OffsetTable(tz, week_start_utc, week_end_utc)
+
+
+class OffsetTableTest(unittest.TestCase):
+    """Différentiel : OffsetTable contre astimezone / localize de pytz pendant les semaines de changement d'heure."""
+
+    def test_utc_to_local_matches_pytz(self):
+        for tz, monday, week_start_utc, table in _weeks():
+            for step in range(-24 * 60 // STEP_MINUTES, 8 * 24 * 60 // STEP_MINUTES): # Déborde de la fenêtre
+                utc_dt = week_start_utc + timedelta(minutes=step * STEP_MINUTES)
+                expected = to_epoch_us(utc_dt.astimezone(tz).replace(tzinfo=pytz.utc))
+                self.assertEqual(table.utc_to_local(to_epoch_us(utc_dt)), expected, (tz.zone, utc_dt))
+
+    def test_localize_matches_pytz(self):
+        for tz, monday, week_start_utc, table in _weeks():
+            for step in range(-24 * 60 // STEP_MINUTES, 8 * 24 * 60 // STEP_MINUTES):
+                naive = monday + timedelta(minutes=step * STEP_MINUTES)
+                for is_dst in (True, False): # Heures ambiguës et inexistantes comprises
+                    expected = tz.localize(naive, is_dst=is_dst).astimezone(pytz.utc)
+                    self.assertEqual(table.localize(naive, is_dst=is_dst), expected, (tz.zone, naive, is_dst))
+
+    def test_random_instants_match_pytz(self):
+        rng = random.Random(SEED)
+        for tz, monday, week_start_utc, table in _weeks():
+            for _ in range(50):
+                naive = monday + timedelta(microseconds=rng.randrange(7 * 24 * 3600 * 1000000))
+                is_dst = rng.random() < 0.5
+                self.assertEqual(table.localize(naive, is_dst=is_dst),
+                                 tz.localize(naive, is_dst=is_dst).astimezone(pytz.utc), (tz.zone, naive, is_dst))
+                utc_dt = week_start_utc + (naive - monday)
+                self.assertEqual(table.utc_to_local(to_epoch_us(utc_dt)),
+                                 to_epoch_us(utc_dt.astimezone(tz).replace(tzinfo=pytz.utc)), (tz.zone, utc_dt))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# --- Fin de test_tz_utils.py ---
@@ -0,0 +1,144 @@
+import json
+import threading
+import time as time_module
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+
+class Trace:
+    """
+    Durées par phase (download, parse, merge, schedule, serialize, ...) et compteurs
+    (octets récupérés, VEVENT parcourus, créneaux, ...) d'une génération du flux.
+
+    Les durées d'une même phase s'additionnent : pour les sources téléchargées en parallèle,
+    download et parse sont des durées cumulées, pas des durées murales.
+    """
+    enabled = True
+
+    def __init__(self, name):
+        """
+        Args:
+            name (str): Nom de la trace, repris dans l'enregistrement de log.
+        """
+        self.name = name
+        self.started = time_module.perf_counter()
+        self.durations = {} # {phase: secondes}, dans l'ordre de première apparition
+        self.counts = {} # {compteur: valeur}
+        self._lock = threading.Lock() # Mises à jour depuis les threads de téléchargement
+
+    @contextmanager
+    def phase(self, name):
+        """Mesure la durée du bloc et l'ajoute à la phase name."""
+        started = time_module.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_duration(name, time_module.perf_counter() - started)
+
+    def add_duration(self, name, seconds):
+        """Ajoute seconds à la durée de la phase name."""
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        """Ajoute value au compteur name."""
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def server_timing(self):
+        """Valeur de l'en-tête Server-Timing : une métrique dur par phase, les compteurs en desc."""
+        with self._lock:
+            metrics = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.durations.items()]
+            metrics.extend(f'{name};desc="{value}"' for name, value in self.counts.items())
+        metrics.append(f"total;dur={(time_module.perf_counter() - self.started) * 1000:.1f}")
+        return ', '.join(metrics)
+
+    def record(self):
+        """Enregistrement structuré de la trace (durées en millisecondes)."""
+        with self._lock:
+            return {
+                'trace': self.name,
+                'total_ms': round((time_module.perf_counter() - self.started) * 1000, 3),
+                'phases_ms': {name: round(seconds * 1000, 3) for name, seconds in self.durations.items()},
+                'counts': dict(self.counts),
+            }
+
+    def log(self):
+        """Écrit l'enregistrement de la trace sur une ligne JSON."""
+        print(f"Trace: {json.dumps(self.record(), sort_keys=True)}")
+
+
+class _NullTrace:
+    """Trace inactive : toutes les opérations sont sans effet (coût négligeable)."""
+    enabled = False
+    name = None
+
+    def phase(self, name):
+        return _NULL_PHASE
+
+    def add_duration(self, name, seconds):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def server_timing(self):
+        return None
+
+    def record(self):
+        return None
+
+    def log(self):
+        pass
+
+
+_NULL_PHASE = nullcontext()
+NULL_TRACE = _NullTrace()
+# Trace de la requête en cours. Les threads de téléchargement la reçoivent par copie du
+# contexte (contextvars.copy_context) au moment de leur soumission.
+_current_trace = ContextVar('nexday_trace', default=NULL_TRACE)
+
+
+def current_trace():
+    """Trace active dans le contexte courant (NULL_TRACE si aucune)."""
+    return _current_trace.get()
+
+
+@contextmanager
+def tracing(name, enabled=True):
+    """
+    Active une trace pour la durée du bloc et la retourne (NULL_TRACE si enabled est faux).
+    L'écriture du log est laissée à l'appelant (trace.log()).
+    """
+    trace = Trace(name) if enabled else NULL_TRACE
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+class TimedChunks:
+    """
+    Itérateur de morceaux bytes qui mesure le temps passé à obtenir chaque morceau
+    (téléchargement, sérialisation, ...) et le nombre total d'octets.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.elapsed = 0.0
+        self.size = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time_module.perf_counter()
+        try:
+            chunk = next(self._chunks)
+        finally:
+            self.elapsed += time_module.perf_counter() - started
+        self.size += len(chunk)
+        return chunk
+
+# --- Fin de tracing.py ---
@@ -0,0 +1,127 @@
+from bisect import bisect_right
+from datetime import date, timedelta
+from functools import lru_cache
+import pytz # Pour les fuseaux horaires
+from intervals import to_epoch_us, from_epoch_us
+
+US_PER_HOUR = 3600 * 1000000
+US_PER_DAY = 24 * US_PER_HOUR
+EPOCH_DATE = date(1970, 1, 1) # Un jeudi (weekday() == 3)
+_MICROSECOND = timedelta(microseconds=1)
+_SIX_HOURS_US = 6 * US_PER_HOUR
+
+
+def local_hour(local_us):
+    """Heure (0-23) d'une heure locale exprimée en microsecondes depuis l'epoch."""
+    return (local_us // US_PER_HOUR) % 24
+
+
+def local_day(local_us):
+    """Nombre de jours depuis le 1970-01-01 d'une heure locale exprimée en microsecondes."""
+    return local_us // US_PER_DAY
+
+
+def local_weekday(local_us):
+    """Jour de la semaine (0 = Lundi, 6 = Dimanche) d'une heure locale en microsecondes."""
+    return (local_day(local_us) + EPOCH_DATE.weekday()) % 7
+
+
+def local_date(local_us):
+    """Date d'une heure locale exprimée en microsecondes depuis l'epoch."""
+    return EPOCH_DATE + timedelta(days=local_day(local_us))
+
+
+def date_to_local_us(value):
+    """Minuit (heure locale) d'une date, en microsecondes depuis l'epoch."""
+    return (value - EPOCH_DATE).days * US_PER_DAY
+
+
+@lru_cache(maxsize=32)
+def _transition_table(tz):
+    """Transitions complètes d'un fuseau pytz : (instants UTC en µs, décalages en µs, drapeaux DST)."""
+    transitions = getattr(tz, '_utc_transition_times', None)
+    if transitions is None: # Fuseau à décalage fixe (UTC, Etc/GMT+3, ...)
+        return [0], [tz.utcoffset(None) // _MICROSECOND], [False]
+    transitions_us = [to_epoch_us(t.replace(tzinfo=pytz.utc)) for t in transitions]
+    offsets_us = [info[0] // _MICROSECOND for info in tz._transition_info]
+    dst_flags = [bool(info[1]) for info in tz._transition_info]
+    return transitions_us, offsets_us, dst_flags
+
+
+class OffsetTable:
+    """
+    Table des décalages UTC d'un fuseau pytz, restreinte à une fenêtre de temps.
+
+    Calculée une seule fois par fenêtre, elle convertit UTC <-> heure locale par arithmétique
+    entière et recherche dichotomique dans quelques transitions, au lieu d'appeler
+    astimezone / localize de pytz pour chaque instant. Les résultats sont identiques à ceux
+    de pytz, y compris pendant les semaines de changement d'heure (mars et octobre) ;
+    les instants hors fenêtre sont délégués à pytz.
+
+    Les heures locales sont exprimées en microsecondes depuis l'epoch, comme si l'heure
+    murale locale était une heure UTC.
+    """
+
+    def __init__(self, tz, window_start_utc, window_end_utc, margin=timedelta(days=2)):
+        """
+        Args:
+            tz (pytz.BaseTzInfo): Fuseau horaire pytz.
+            window_start_utc (datetime): Début de la fenêtre.
+            window_end_utc (datetime): Fin de la fenêtre.
+            margin (timedelta): Marge ajoutée de chaque côté de la fenêtre.
+        """
+        self.tz = tz
+        self.start_us = to_epoch_us(window_start_utc - margin)
+        self.end_us = to_epoch_us(window_end_utc + margin)
+
+        all_transitions, all_offsets, all_dst = _transition_table(tz)
+        first = max(0, bisect_right(all_transitions, self.start_us) - 1)
+        last = max(first + 1, bisect_right(all_transitions, self.end_us))
+        self.transitions_us = all_transitions[first:last]
+        self.transitions_us[0] = self.start_us # La première entrée couvre le début de la fenêtre
+        self.offsets_us = all_offsets[first:last]
+        self.dst_flags = all_dst[first:last]
+        self._min_offset_us = min(self.offsets_us)
+        self._max_offset_us = max(self.offsets_us)
+
+    def utc_to_local(self, utc_us):
+        """Convertit un instant UTC (µs depuis l'epoch) en heure locale (µs), comme astimezone."""
+        if not self.start_us <= utc_us < self.end_us:
+            local = from_epoch_us(utc_us).astimezone(self.tz)
+            return to_epoch_us(local.replace(tzinfo=pytz.utc))
+        return utc_us + self.offsets_us[bisect_right(self.transitions_us, utc_us) - 1]
+
+    def local_to_utc(self, local_us, is_dst=False):
+        """
+        Convertit une heure locale (µs) en instant UTC (µs), comme tz.localize(dt, is_dst).
+
+        Heure inexistante (passage à l'heure d'été) : même résolution que pytz, en se
+        décalant de six heures pour trouver le décalage applicable.
+        Heure ambiguë (retour à l'heure d'hiver) : is_dst choisit entre les deux instants.
+        """
+        if not (self.start_us <= local_us - self._max_offset_us and local_us - self._min_offset_us < self.end_us):
+            naive = from_epoch_us(local_us).replace(tzinfo=None)
+            return to_epoch_us(self.tz.localize(naive, is_dst=is_dst))
+
+        candidates = {} # {instant UTC: drapeau DST}
+        for index, offset_us in enumerate(self.offsets_us):
+            utc_us = local_us - offset_us
+            if bisect_right(self.transitions_us, utc_us) - 1 == index:
+                candidates[utc_us] = self.dst_flags[index]
+
+        if len(candidates) == 1:
+            return next(iter(candidates))
+        if not candidates:
+            # Heure sautée : pytz recule (ou avance) de six heures puis réapplique ce décalage
+            if is_dst:
+                return self.local_to_utc(local_us + _SIX_HOURS_US, is_dst=True) - _SIX_HOURS_US
+            return self.local_to_utc(local_us - _SIX_HOURS_US, is_dst=False) + _SIX_HOURS_US
+        matching = [utc_us for utc_us, dst in candidates.items() if dst == bool(is_dst)] or list(candidates)
+        return min(matching) if is_dst else max(matching)
+
+    def localize(self, naive_dt, is_dst=False):
+        """Équivalent de tz.localize(naive_dt, is_dst).astimezone(pytz.utc)."""
+        local_us = to_epoch_us(naive_dt.replace(tzinfo=pytz.utc))
+        return from_epoch_us(self.local_to_utc(local_us, is_dst=is_dst))
+
+# --- Fin de tz_utils.py ---